@@ -0,0 +1,373 @@
+"""
+analytics.py - Report aggregates computed with NumPy over column arrays of every sale.
+
+SalesColumns holds four columns per sale, archived years included:
+product_id and day (sale_day) as int32, quantity as int32 and amount
+(total) as float64. They are kept as flat binary files in a folder next
+to the database (<db>-analytics/) and memory-mapped, so a restart does
+not reload them. refresh() appends only the sales with an id above the
+last one loaded. A sale count that no longer matches the database's
+(see database.get_sales_since) means rows were deleted, and the columns
+are rebuilt.
+
+The report helpers below return the same rows as their database.py
+namesakes, but are computed with np.bincount over the columns instead
+of in SQL:
+
+    rows = analytics.get_top_products(10)
+
+Group-bys are bincounts over the dense product ids. Per-product totals
+are kept between calls and only the new rows are added to them, and
+while sales are in date order a date range is found by binary search,
+so after the first call a chart costs per-product rather than per-sale
+work. benchmarks/bench_analytics.py compares them with the SQL. Several
+processes can share the folder: a refresh holds an exclusive lock on
+its lock file.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import database as db
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+
+# (name, dtype) of each column file.
+COLUMNS = (
+    ("product_id", np.int32),
+    ("day", np.int32),
+    ("quantity", np.int32),
+    ("amount", np.float64),
+)
+
+# Sales fetched per query while loading.
+LOAD_CHUNK = 100_000
+
+
+def columns_folder(db_path=None):
+    """Return the column folder for a database file, e.g. 'inventory-analytics'."""
+    db_path = os.path.abspath(db_path or db.DB_PATH)
+    return os.path.splitext(db_path)[0] + "-analytics"
+
+
+class _FileLock:
+    """An exclusive lock on a file, held across processes."""
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT)
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+
+
+class SalesColumns:
+    """Memory-mapped product_id, day, quantity and amount arrays of every sale."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file_lock = _FileLock(os.path.join(folder, "lock"))
+        self.rows = 0
+        self.last_id = 0
+        self.generation = 0
+        self.days_sorted = True
+        self.arrays = {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+        self._products = None
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def _read_meta(self):
+        """Return (rows, last_id, generation); generation counts rebuilds."""
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+            return meta["rows"], meta["last_id"], meta["generation"]
+        except (OSError, ValueError, KeyError):
+            return 0, 0, 0
+
+    def _write_meta(self, rows, last_id, generation):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"rows": rows, "last_id": last_id, "generation": generation}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def _map(self, rows, last_id, generation):
+        """Point the arrays at the first `rows` entries of the column files."""
+        if (rows, last_id, generation) != (self.rows, self.last_id, self.generation):
+            self.arrays = {
+                name: (np.memmap(self._path(name), dtype, mode="r", shape=(rows,))
+                       if rows else np.empty(0, dtype))
+                for name, dtype in COLUMNS}
+            # Sales are normally recorded in date order; check the new rows.
+            checked = self.rows if generation == self.generation else 0
+            day = self.arrays["day"][max(checked - 1, 0):]
+            self.days_sorted = ((self.days_sorted or not checked)
+                                and bool(np.all(day[1:] >= day[:-1])))
+            self.rows = rows
+            self.last_id = last_id
+            self.generation = generation
+
+    def _append(self, rows, chunk):
+        """Write a chunk of get_sales_since() rows after the first `rows` entries."""
+        data = np.array(chunk, dtype=np.float64)
+        for i, (name, dtype) in enumerate(COLUMNS, start=1):
+            with open(self._path(name), "ab") as f:
+                # Drop anything past `rows` left by an interrupted refresh.
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(data[:, i].astype(dtype).tobytes())
+        return rows + len(chunk), int(data[-1, 0])
+
+    def _reset(self, generation):
+        """Start over with empty files.
+
+        Removing them, rather than truncating, leaves arrays still mapped
+        by readers intact.
+        """
+        for name, _ in COLUMNS:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        self._write_meta(0, 0, generation + 1)
+
+    def refresh(self):
+        """Load the sales added since the last refresh; return self."""
+        with self.lock, self.file_lock:
+            for attempt in range(2):
+                # Another process may have loaded more meanwhile.
+                rows, last_id, generation = self._read_meta()
+                while True:
+                    count, chunk = db.get_sales_since(last_id, LOAD_CHUNK)
+                    if chunk:
+                        rows, last_id = self._append(rows, chunk)
+                        self._write_meta(rows, last_id, generation)
+                    if len(chunk) < LOAD_CHUNK:
+                        break
+                if rows == count:
+                    break
+                if attempt:
+                    # Rows deleted during the rebuild too: keep what was
+                    # loaded; the next refresh sees the mismatch again.
+                    break
+                self._reset(generation)
+            self._map(rows, last_id, generation)
+        return self
+
+    def snapshot(self):
+        """Return (generation, days_sorted, columns) as of the last refresh.
+
+        columns is (product_id, day, quantity, amount); days_sorted tells
+        whether the rows are in date order.
+        """
+        with self.lock:
+            arrays = self.arrays
+            return (self.generation, self.days_sorted,
+                    tuple(arrays[name] for name, _ in COLUMNS))
+
+    def columns(self, first_day=None, last_day=None):
+        """Return (product_id, day, quantity, amount) as of the last refresh.
+
+        With days given, the rows returned include all sales on those days
+        and, when the rows are in date order, only those.
+        """
+        _, days_sorted, columns = self.snapshot()
+        if first_day is None:
+            return columns
+        rows = day_range(columns[1], days_sorted, first_day, last_day)
+        return tuple(column[rows] for column in columns)
+
+    def product_totals(self):
+        """Return (lines, units, revenue) arrays indexed by product id.
+
+        Kept between refreshes: only rows appended since the last call are
+        summed, unless the columns were rebuilt.
+        """
+        with self.lock:
+            cached = self._products
+            arrays, rows, generation = self.arrays, self.rows, self.generation
+        done, totals = 0, ()
+        if cached is not None and cached[0] == generation and cached[1] <= rows:
+            _, done, totals = cached
+        if done < rows or not totals:
+            product_id = arrays["product_id"][done:rows]
+            added = (group_sum(product_id),
+                     group_sum(product_id, arrays["quantity"][done:rows]),
+                     group_sum(product_id, arrays["amount"][done:rows]))
+            if totals:
+                size = max(len(totals[0]), len(added[0]))
+                added = tuple(np.pad(old, (0, size - len(old)))
+                              + np.pad(new, (0, size - len(new)))
+                              for old, new in zip(totals, added))
+            totals = added
+            with self.lock:
+                self._products = (generation, rows, totals)
+        return totals
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_columns():
+    """Return the refreshed SalesColumns for the current database."""
+    folder = columns_folder()
+    with _instances_lock:
+        columns = _instances.get(folder)
+        if columns is None:
+            columns = _instances[folder] = SalesColumns(folder)
+    return columns.refresh()
+
+
+# --------------- Vectorized operations ---------------
+
+def group_sum(keys, values=None, size=0):
+    """Sum `values` (or count rows) per non-negative integer key.
+
+    Returns an array indexed by key, at least `size` long.
+    """
+    if values is None:
+        return np.bincount(keys, minlength=size)
+    return np.bincount(keys, weights=values, minlength=size)
+
+
+def top_k(values, k=None):
+    """Return the indexes of the k (default all) largest values, largest first."""
+    k = len(values) if k is None else min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    index = np.argpartition(-values, k - 1)[:k]
+    return index[np.argsort(-values[index], kind="stable")]
+
+
+def day_range(day, days_sorted, first_day, last_day):
+    """Return a slice of the rows that holds every sale from first_day to last_day.
+
+    Found by binary search when the days are sorted, else every row.
+    """
+    if not days_sorted:
+        return slice(None)
+    return slice(np.searchsorted(day, first_day, side="left"),
+                 np.searchsorted(day, last_day, side="right"))
+
+
+def time_buckets(days, first_day, last_day, *values, width=1):
+    """Count rows, and sum each of `values`, per `width`-day bucket.
+
+    Buckets run from first_day to last_day; bucket i starts on day
+    first_day + i * width. Returns [counts, sums...], one array each.
+    """
+    mask = (days >= first_day) & (days <= last_day)
+    keys = (days[mask] - first_day) // width
+    size = (last_day - first_day) // width + 1
+    return [group_sum(keys, None, size)] + [group_sum(keys, v[mask], size) for v in values]
+
+
+def _by_group(groups, size, lines, sums):
+    """Add per-product sums into `size` per-group sums.
+
+    Returns (indexes of the groups with sales, group sums...). Products
+    mapped to -1 are left out.
+    """
+    valid = (lines > 0) & (groups >= 0)
+    keys = groups[valid]
+    totals = [group_sum(keys, values[valid], size) for values in sums]
+    return (np.flatnonzero(group_sum(keys, None, size)), *totals)
+
+
+def _catalog_groups(size):
+    """Return (names, name_of, categories, category_of, cost) for products 0..size-1.
+
+    name_of and category_of map a product id to an index into names and
+    categories, or -1 for ids with no product; cost is its cost price.
+    """
+    names, categories = {}, {}
+    name_of = np.full(size, -1, dtype=np.int64)
+    category_of = np.full(size, -1, dtype=np.int64)
+    cost = np.zeros(size)
+    for row in db.get_catalog():
+        product_id = row[0]
+        if product_id < size:
+            name_of[product_id] = names.setdefault(row[1], len(names))
+            category_of[product_id] = categories.setdefault(row[3], len(categories))
+            cost[product_id] = row[5]
+    return list(names), name_of, list(categories), category_of, cost
+
+
+# --------------- Report helpers ---------------
+
+def get_sales_summary(days=30):
+    """Return daily totals for the last `days` days, as ('YYYY-MM-DD', revenue, units).
+
+    Same rows as database.get_sales_summary().
+    """
+    first_day = db.to_timestamp(datetime.now().date() - timedelta(days=days)) // db.DAY
+    # Like the SQL, include any sales dated after today.
+    last_day = np.iinfo(np.int32).max
+    _, day, quantity, amount = get_columns().columns(first_day, last_day)
+    if len(day):
+        last_day = max(int(day.max()), first_day)
+    else:
+        last_day = first_day
+    lines, revenue, units = time_buckets(day, first_day, last_day, amount, quantity)
+    epoch = datetime(1970, 1, 1)
+    return [((epoch + timedelta(days=first_day + int(i))).strftime("%Y-%m-%d"),
+             float(revenue[i]), int(units[i]))
+            for i in np.flatnonzero(lines)]
+
+
+def get_top_products(limit=10):
+    """Return (name, units, revenue) of the best-selling products by revenue.
+
+    With limit=None, every product that has sales.
+    """
+    lines, units, revenue = get_columns().product_totals()
+    names, name_of, _, _, _ = _catalog_groups(len(lines))
+    sold, units, revenue = _by_group(name_of, len(names), lines, (units, revenue))
+    return [(names[i], int(units[i]), float(revenue[i]))
+            for i in sold[top_k(revenue[sold], limit)]]
+
+
+def get_category_sales():
+    """Return (category, revenue) per category with sales, largest first."""
+    lines, _, revenue = get_columns().product_totals()
+    _, _, categories, category_of, _ = _catalog_groups(len(lines))
+    sold, revenue = _by_group(category_of, len(categories), lines, (revenue,))
+    return [(categories[i], float(revenue[i]))
+            for i in sold[top_k(revenue[sold])]]
+
+
+def get_product_profit(limit=10):
+    """Return (name, revenue, cost, profit) for the most profitable products.
+
+    Cost uses each product's current cost price, as in
+    database.get_product_profit().
+    """
+    lines, units, revenue = get_columns().product_totals()
+    names, name_of, _, _, cost_price = _catalog_groups(len(lines))
+    sold, revenue, cost = _by_group(name_of, len(names), lines,
+                                    (revenue, units * cost_price))
+    profit = revenue - cost
+    return [(names[i], float(revenue[i]), float(cost[i]), float(profit[i]))
+            for i in sold[top_k(profit[sold], limit)]]
@@ -0,0 +1,408 @@
+"""
+api_server.py - Local HTTP/JSON API over the inventory database.
+
+A headless alternative to the GUI for the web storefront and handheld
+scanners. Built on asyncio streams (stdlib only): HTTP/1.1 with keep-alive
+and request pipelining. Requests on one connection are read ahead and
+handled concurrently, and their responses are written back in request
+order. Database work goes through async_database: writes on its single
+writer thread, reads on a pool of reader threads.
+
+    python api_server.py [--host 127.0.0.1] [--port 8765] [--readers 8]
+
+Endpoints (JSON in, JSON out):
+
+    GET  /products?limit=&after_name=&after_id=    page of products by name
+    GET  /products/<id>                            one product
+    GET  /products/sku/<sku>                       one product by SKU
+    GET  /products/low-stock                       products at or below threshold
+    GET  /search?q=&limit=                         full-text product search
+    GET  /sales?start=&end=&limit=&after_id=&after_date=
+    POST /sales          {"product_id", "quantity", "price"}
+    POST /sales/batch    {"lines": [[product_id, quantity, price], ...]}
+    GET  /stock/movements?product_id=&limit=&after_id=&after_date=
+    POST /stock/in       {"product_id", "quantity", "note"}
+    POST /stock/out      {"product_id", "quantity", "note"}
+    GET  /reports/kpis | /reports/summary | /reports/top-products?limit=
+         /reports/categories | /reports/profit?limit= | /reports/totals?start=&end=
+
+Errors come back as {"error": ...}: 404 for an unknown route or product
+(including writes that name one), 409 when stock runs short, 400 for
+other bad input.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+import async_database as adb
+import database as db
+
+
+# Requests read ahead of their response on one connection.
+MAX_PIPELINE = 32
+MAX_BODY = 1 << 20
+MAX_HEADER_LINES = 100
+
+PRODUCT_FIELDS = ("id", "name", "sku", "category", "price", "cost_price",
+                  "quantity", "low_stock_threshold", "description",
+                  "created_at", "updated_at", "category_id")
+SALE_FIELDS = ("id", "product", "quantity_sold", "sale_price", "total", "sale_date")
+MOVEMENT_FIELDS = ("id", "product", "type", "quantity", "note", "created_at")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+def _records(fields, rows):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def _int(query, name, default=None, maximum=None):
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    return min(number, maximum) if maximum else number
+
+
+def _require(body, *names):
+    missing = [name for name in names if name not in body]
+    if missing:
+        raise HTTPError(400, f"missing field(s): {', '.join(missing)}")
+    return [body[name] for name in names]
+
+
+# ---- Handlers: (query, body) -> JSON-able result ----
+
+async def list_products(query, body):
+    after = None
+    if "after_id" in query:
+        after = (_int(query, "after_id"), query.get("after_name", ""))
+    return _records(PRODUCT_FIELDS, await adb.get_products_page(
+        after, _int(query, "limit", db.PAGE_SIZE, maximum=5000)))
+
+
+async def get_product(query, body, product_id):
+    product = await adb.get_product_by_id(int(product_id))
+    if product is None:
+        raise HTTPError(404, "no such product")
+    return dict(zip(PRODUCT_FIELDS, product))
+
+
+async def get_product_by_sku(query, body, sku):
+    product = await adb.get_product_by_sku(unquote(sku))
+    if product is None:
+        raise HTTPError(404, "no such product")
+    return dict(zip(PRODUCT_FIELDS, product))
+
+
+async def low_stock(query, body):
+    return _records(PRODUCT_FIELDS[:8], await adb.get_low_stock_products())
+
+
+async def search(query, body):
+    return _records(PRODUCT_FIELDS, await adb.search_products(
+        query.get("q", ""), limit=_int(query, "limit", 50, maximum=500)))
+
+
+async def list_sales(query, body):
+    after = None
+    if "after_id" in query:
+        after = (_int(query, "after_id"), None, None, None, None, query.get("after_date", ""))
+    return _records(SALE_FIELDS, await adb.get_sales_page(
+        query.get("start"), query.get("end"), after,
+        _int(query, "limit", db.PAGE_SIZE, maximum=5000)))
+
+
+async def record_sale(query, body):
+    product_id, quantity, price = _require(body, "product_id", "quantity", "price")
+    await adb.record_sale(int(product_id), int(quantity), float(price))
+    return {"ok": True}
+
+
+async def record_sales_batch(query, body):
+    (lines,) = _require(body, "lines")
+    results = await adb.record_sales_batch(
+        [(int(pid), int(qty), float(price)) for pid, qty, price in lines])
+    return [{"ok": ok, "error": error} for ok, error in results]
+
+
+async def list_movements(query, body):
+    after = None
+    if "after_id" in query:
+        after = (_int(query, "after_id"), None, None, None, None, query.get("after_date", ""))
+    return _records(MOVEMENT_FIELDS, await adb.get_stock_movements_page(
+        _int(query, "product_id"), after,
+        _int(query, "limit", db.PAGE_SIZE, maximum=5000)))
+
+
+async def stock_in(query, body):
+    product_id, quantity = _require(body, "product_id", "quantity")
+    await adb.add_stock_in(int(product_id), int(quantity), body.get("note", ""))
+    return {"ok": True}
+
+
+async def stock_out(query, body):
+    product_id, quantity = _require(body, "product_id", "quantity")
+    await adb.add_stock_out(int(product_id), int(quantity), body.get("note", ""))
+    return {"ok": True}
+
+
+async def kpis(query, body):
+    fields = ("product_count", "units_on_hand", "low_stock_count",
+              "total_revenue", "today_revenue", "total_sales")
+    return dict(zip(fields, await adb.get_dashboard_kpis()))
+
+
+async def sales_summary(query, body):
+    return _records(("day", "revenue", "units"), await adb.get_sales_summary())
+
+
+async def top_products(query, body):
+    return _records(("name", "units", "revenue"),
+                    await adb.get_top_products(_int(query, "limit", 10, maximum=1000)))
+
+
+async def category_sales(query, body):
+    return _records(("category", "revenue"), await adb.get_category_sales())
+
+
+async def product_profit(query, body):
+    return _records(("name", "revenue", "cost", "profit"),
+                    await adb.get_product_profit(_int(query, "limit", 10, maximum=1000)))
+
+
+async def sales_totals(query, body):
+    count, units, revenue = await adb.get_sales_totals(query.get("start"), query.get("end"))
+    return {"sales": count, "units": units, "revenue": revenue}
+
+
+ROUTES = [
+    ("GET", r"/products", list_products),
+    ("GET", r"/products/low-stock", low_stock),
+    ("GET", r"/products/sku/(.+)", get_product_by_sku),
+    ("GET", r"/products/(\d+)", get_product),
+    ("GET", r"/search", search),
+    ("GET", r"/sales", list_sales),
+    ("POST", r"/sales", record_sale),
+    ("POST", r"/sales/batch", record_sales_batch),
+    ("GET", r"/stock/movements", list_movements),
+    ("POST", r"/stock/in", stock_in),
+    ("POST", r"/stock/out", stock_out),
+    ("GET", r"/reports/kpis", kpis),
+    ("GET", r"/reports/summary", sales_summary),
+    ("GET", r"/reports/top-products", top_products),
+    ("GET", r"/reports/categories", category_sales),
+    ("GET", r"/reports/profit", product_profit),
+    ("GET", r"/reports/totals", sales_totals),
+]
+ROUTES = [(method, re.compile(pattern + r"/?"), handler)
+          for method, pattern, handler in ROUTES]
+
+
+def _route(method, path):
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return handler, match.groups()
+            allowed = True
+    raise HTTPError(405 if allowed else 404)
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+async def read_request(reader):
+    """Parse one request from `reader`; None at a clean end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431)
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "malformed Content-Length")
+    if length < 0:
+        raise HTTPError(400, "malformed Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413)
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, version, headers, body)
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class APIServer:
+    """Serves ROUTES on async_database's reader and writer threads."""
+
+    def __init__(self, readers=8):
+        adb.start(readers)
+
+    async def handle(self, request):
+        """Return (status, payload) for one request."""
+        try:
+            split = urlsplit(request.target)
+            handler, groups = _route(request.method, split.path)
+            query = dict(parse_qsl(split.query))
+            try:
+                body = json.loads(request.body) if request.body else {}
+            except ValueError:
+                raise HTTPError(400, "body is not valid JSON")
+            status = 201 if request.method == "POST" else 200
+            return status, await handler(query, body, *groups)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except db.UnknownProductError as e:
+            return 404, {"error": str(e), "product_id": e.product_id}
+        except db.InsufficientStockError as e:
+            return 409, {"error": str(e), "product_id": e.product_id,
+                         "requested": e.requested, "available": e.available}
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def serve_connection(self, reader, writer):
+        # The reader loop queues each request's handling task; the writer
+        # loop sends responses in request order. The bounded queue stops
+        # reading ahead when a client pipelines faster than we answer.
+        pending = asyncio.Queue(MAX_PIPELINE)
+        # Pipelined reads run concurrently, but a write waits for every
+        # request before it and later requests wait for the write, so a
+        # client sees its own writes in the order it sent them.
+        last_write, since_write = None, []
+
+        async def after(earlier, request):
+            if earlier:
+                await asyncio.wait(earlier)
+            return await self.handle(request)
+
+        async def read_loop():
+            nonlocal last_write, since_write
+            try:
+                while True:
+                    try:
+                        request = await read_request(reader)
+                    except HTTPError as e:
+                        await pending.put((None, (e.status, {"error": str(e)}), False))
+                        return
+                    if request is None:
+                        return
+                    barrier = [last_write] if last_write else []
+                    if request.method == "GET":
+                        task = asyncio.ensure_future(after(barrier, request))
+                        since_write.append(task)
+                        if len(since_write) > MAX_PIPELINE:
+                            # Long runs of reads: forget the ones already answered.
+                            since_write = [t for t in since_write if not t.done()]
+                    else:
+                        task = asyncio.ensure_future(after(barrier + since_write, request))
+                        last_write, since_write = task, []
+                    await pending.put((task, None, request.keep_alive))
+                    if not request.keep_alive:
+                        return
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            finally:
+                await pending.put(None)
+
+        reading = asyncio.ensure_future(read_loop())
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                task, result, keep_alive = item
+                status, payload = await task if task else result
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            reading.cancel()
+            # The client is gone: drop the answers it will never read, which
+            # interrupts reads still running (see async_database).
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None and item[0] is not None:
+                    item[0].cancel()
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.serve_connection, host, port,
+                                            reuse_address=True)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving inventory API on {addresses}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        adb.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--readers", type=int, default=8,
+                        help="database reader threads (each holds one connection)")
+    args = parser.parse_args()
+
+    db.init_db()
+    api = APIServer(args.readers)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+if __name__ == "__main__":
+    main()
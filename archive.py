@@ -0,0 +1,151 @@
+"""
+archive.py - Move closed years of sales and stock movements out of the main database.
+
+Each archived year goes to its own file next to the database (see
+database.archive_file), attached on demand by the query helpers in
+database.py. get_sales(), get_sales_page(), get_stock_movements() and the
+rest keep returning archived rows, but a date-ranged query only opens the
+years it overlaps, and the hot tables in main only hold recent data. The
+sales_daily rollup keeps archived days, so the reports are unchanged.
+
+Archiving is online: rows move in chunks of `chunk_size`, each copied in
+one short transaction and deleted from main in the next, so the app and
+api_server.py keep running meanwhile. It is also resumable: a year is
+registered in archive_partitions as 'copying' before anything moves and
+marked 'done' at the end, and running it again after an interruption
+carries on where it stopped.
+
+    python archive.py [--keep-years N] [--year YEAR] [--chunk-size N] [--list]
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import database as db
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# (table, timestamp column, columns copied) of each archived table.
+ARCHIVED_TABLES = (
+    ("sales", "sale_date",
+     "id, product_id, quantity_sold, sale_price, total, sale_date"),
+    ("stock_movements", "created_at",
+     "id, product_id, movement_type, quantity, note, created_at"),
+)
+
+
+def year_bounds(year):
+    """Return (start_ts, end_ts): the first seconds of `year` and the next year."""
+    return db.to_timestamp(date(year, 1, 1)), db.to_timestamp(date(year + 1, 1, 1))
+
+
+def _move_chunk(schema, table, column, columns, start_ts, end_ts, chunk_size):
+    """Move up to chunk_size rows of [start_ts, end_ts) into the archive; return the count."""
+    with db.transaction(immediate=True) as conn:
+        ids = [row[0] for row in conn.execute(f"""
+            SELECT id FROM main.{table}
+            WHERE {column} >= ? AND {column} < ?
+            LIMIT ?
+        """, (start_ts, end_ts, chunk_size))]
+        if not ids:
+            return 0
+        marks = ",".join("?" * len(ids))
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {schema}.{table} ({columns})
+            SELECT {columns} FROM main.{table} WHERE id IN ({marks})
+        """, ids)
+    # A separate transaction: with WAL, a transaction over two files is
+    # not atomic across them, so only delete rows the archive has committed.
+    with db.transaction(immediate=True) as conn:
+        conn.execute(f"""
+            DELETE FROM main.{table}
+            WHERE id IN (SELECT id FROM {schema}.{table} WHERE id IN ({marks}))
+        """, ids)
+    return len(ids)
+
+
+def archive_year(year, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Move `year`'s sales and stock movements into its archive file.
+
+    Returns the number of rows moved. Raises ValueError unless the year
+    has ended. `progress(table, moved)` is called after each chunk.
+    """
+    start_ts, end_ts = year_bounds(year)
+    if end_ts > db.to_timestamp():
+        raise ValueError(f"{year} is not over yet.")
+    # Until it is 'done' again, queries read the year from both main and
+    # its archive, so no row is missed while it is moving.
+    with db.transaction(immediate=True) as conn:
+        conn.execute("""
+            INSERT INTO archive_partitions (year, file, start_ts, end_ts)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (year) DO UPDATE SET status = 'copying'
+        """, (year, db.archive_file(year), start_ts, end_ts))
+        file = conn.execute(
+            "SELECT file FROM archive_partitions WHERE year=?", (year,)).fetchone()[0]
+
+    schema = db.attach_archive(year, file)
+    conn = db.get_connection()
+    conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+    conn.executescript(db.ARCHIVE_SCHEMA.format(schema=schema))
+
+    moved = 0
+    for table, column, columns in ARCHIVED_TABLES:
+        while True:
+            count = _move_chunk(schema, table, column, columns, start_ts, end_ts, chunk_size)
+            if not count:
+                break
+            moved += count
+            if progress is not None:
+                progress(table, moved)
+
+    with db.transaction(immediate=True) as conn:
+        conn.execute("UPDATE archive_partitions SET status='done' WHERE year=?", (year,))
+    return moved
+
+
+def closed_years(keep_years=1):
+    """Return the years to archive, oldest first.
+
+    Those before the last `keep_years` years (the current one included)
+    that still have rows in main, and any whose archiving was interrupted.
+    """
+    before = date.today().year - keep_years + 1
+    conn = db.get_connection()
+    years = {year for year, _, _, _, status in db.get_archive_partitions()
+             if status != "done" and year < before}
+    for table, column, _ in ARCHIVED_TABLES:
+        first = conn.execute(f"SELECT MIN({column}) FROM main.{table}").fetchone()[0]
+        if first is None:
+            continue
+        first_year = (date(1970, 1, 1) + timedelta(days=first // db.DAY)).year
+        for year in range(first_year, before):
+            if conn.execute(f"""
+                SELECT 1 FROM main.{table} WHERE {column} >= ? AND {column} < ? LIMIT 1
+            """, year_bounds(year)).fetchone():
+                years.add(year)
+    return sorted(years)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keep-years", type=int, default=1,
+                        help="keep this many years, the current one included, in main")
+    parser.add_argument("--year", type=int, help="archive only this year")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--list", action="store_true", help="list archived years and exit")
+    args = parser.parse_args()
+
+    db.init_db()
+    if not args.list:
+        years = [args.year] if args.year else closed_years(args.keep_years)
+        for year in years:
+            moved = archive_year(year, args.chunk_size)
+            print(f"{year}: moved {moved:,} rows")
+    for year, file, _, _, status in db.get_archive_partitions():
+        print(f"{year}  {file}  {status}")
+
+
+if __name__ == "__main__":
+    main()
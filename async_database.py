@@ -0,0 +1,277 @@
+"""
+async_database.py - Awaitable counterparts of the database.py helpers.
+
+For asyncio frontends (see api_server.py). Every helper here runs its
+database.py namesake on a thread and returns the same result:
+
+    products = await adb.search_products("lamp", limit=20)
+    await adb.record_sale(product_id, 2, 9.5)
+
+Left out on purpose: helpers tied to the calling thread's own connection
+(get_connection, close_connection, transaction, attach_archive, and
+get_data_version, whose token is only comparable on one connection; use
+get_table_versions instead), the process-wide switches
+enable_instrumentation and disable_instrumentation, which can be called
+directly, and to_timestamp and archive_file, which do no database work.
+
+Writes go to a single writer thread, so they are applied one at a time in
+the order they were awaited and never queue on each other's SQLite write
+lock. Reads run on a pool of reader threads, each with its own connection
+(see database.get_connection), concurrently with each other and with the
+writer thanks to WAL.
+
+Backpressure: at most `max_pending` reads and `max_pending` writes are
+queued or running at once; further callers wait their turn in the event
+loop instead of piling up work on the threads.
+
+Cancellation: a call cancelled before its thread picks it up never runs.
+A read cancelled while running is interrupted (sqlite3 interrupt) and
+its transaction rolled back. A write that has started is left to finish,
+because its caller could not otherwise know whether it committed; only
+the wait for it is cancelled.
+
+start() sets the pool sizes; without it the first call starts the
+defaults. close() waits for queued work and stops the threads.
+"""
+
+import asyncio
+import functools
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+
+
+DEFAULT_READERS = 4
+DEFAULT_MAX_PENDING = 64
+
+
+class _Job:
+    """One call on a pool thread, remembering the connection it runs on."""
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def run(self):
+        conn = db.get_connection()
+        with self.lock:
+            self.conn = conn
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.conn = None
+
+    def interrupt(self):
+        """Abort the statement this job is running, if it is still running."""
+        with self.lock:
+            if self.conn is not None:
+                try:
+                    self.conn.interrupt()
+                except sqlite3.ProgrammingError:
+                    pass    # connection already closed
+
+
+class _Pool:
+    def __init__(self, readers, max_pending):
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.readers = ThreadPoolExecutor(max_workers=readers,
+                                          thread_name_prefix="db-reader")
+        self.max_pending = max_pending
+        # Semaphores belong to one event loop; keep a pair per loop.
+        self.slots = weakref.WeakKeyDictionary()
+
+    def slot(self, loop, write):
+        pair = self.slots.get(loop)
+        if pair is None:
+            pair = self.slots[loop] = (asyncio.Semaphore(self.max_pending),
+                                       asyncio.Semaphore(self.max_pending))
+        return pair[write]
+
+    def shutdown(self):
+        self.writer.shutdown(wait=True)
+        self.readers.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start(readers=DEFAULT_READERS, max_pending=DEFAULT_MAX_PENDING):
+    """Start the writer thread and `readers` reader threads.
+
+    Restarts the pools (after finishing their queued work) if already started.
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, _Pool(readers, max_pending)
+    if old is not None:
+        old.shutdown()
+
+
+def close():
+    """Finish queued work and stop the threads. Safe to call more than once."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, None
+    if old is not None:
+        old.shutdown()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _Pool(DEFAULT_READERS, DEFAULT_MAX_PENDING)
+        return _pool
+
+
+async def _call(write, func, *args, **kwargs):
+    pool = _get_pool()
+    loop = asyncio.get_running_loop()
+    slot = pool.slot(loop, write)
+    await slot.acquire()
+    job = _Job(func, args, kwargs)
+    try:
+        future = (pool.writer if write else pool.readers).submit(job.run)
+    except BaseException:
+        slot.release()
+        raise
+
+    def release(_):
+        # The slot is held until the thread is done with the job, even if
+        # the caller stopped waiting, so cancelled work still counts.
+        try:
+            loop.call_soon_threadsafe(slot.release)
+        except RuntimeError:
+            pass    # event loop already closed
+
+    future.add_done_callback(release)
+    try:
+        # wrap_future cancels a job that has not started yet.
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        if not write:
+            job.interrupt()
+        raise
+
+
+async def run_read(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on a reader thread and return its result.
+
+    For read-only code that strings several database.py calls together.
+    """
+    return await _call(False, func, *args, **kwargs)
+
+
+async def run_write(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the writer thread and return its result.
+
+    For a multi-step write: do it all inside one database.transaction()
+    in `func` and it commits or rolls back as a whole.
+    """
+    return await _call(True, func, *args, **kwargs)
+
+
+def _reader(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _call(False, func, *args, **kwargs)
+    return wrapper
+
+
+def _writer(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _call(True, func, *args, **kwargs)
+    return wrapper
+
+
+async def _iter_pages(fetch_page, page_size):
+    """Async counterpart of database._iter_pages."""
+    after = None
+    while True:
+        rows = await fetch_page(after)
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        after = rows[-1]
+
+
+# --------------- Schema ---------------
+
+init_db = _writer(db.init_db)
+get_schema_version = _reader(db.get_schema_version)
+get_table_versions = _reader(db.get_table_versions)
+get_archive_partitions = _reader(db.get_archive_partitions)
+
+# --------------- Categories ---------------
+
+get_categories = _reader(db.get_categories)
+add_category = _writer(db.add_category)
+
+# --------------- Products ---------------
+
+get_catalog = _reader(db.get_catalog)
+get_all_products = _reader(db.get_all_products)
+get_products_page = _reader(db.get_products_page)
+get_product_by_id = _reader(db.get_product_by_id)
+get_product_by_sku = _reader(db.get_product_by_sku)
+get_low_stock_products = _reader(db.get_low_stock_products)
+search_products = _reader(db.search_products)
+add_product = _writer(db.add_product)
+update_product = _writer(db.update_product)
+delete_product = _writer(db.delete_product)
+
+
+def iter_products(chunk_size=db.PAGE_SIZE):
+    """Yield every product in name order, fetching one page at a time."""
+    return _iter_pages(lambda after: get_products_page(after, chunk_size), chunk_size)
+
+
+# --------------- Stock movements ---------------
+
+add_stock_in = _writer(db.add_stock_in)
+add_stock_out = _writer(db.add_stock_out)
+get_stock_movements = _reader(db.get_stock_movements)
+get_stock_movements_page = _reader(db.get_stock_movements_page)
+count_stock_movements = _reader(db.count_stock_movements)
+
+
+def iter_stock_movements(product_id=None, chunk_size=db.PAGE_SIZE):
+    """Yield stock movements newest first, fetching one page at a time."""
+    return _iter_pages(
+        lambda after: get_stock_movements_page(product_id, after, chunk_size), chunk_size)
+
+
+# --------------- Sales ---------------
+
+record_sale = _writer(db.record_sale)
+record_sales_batch = _writer(db.record_sales_batch)
+get_sales = _reader(db.get_sales)
+get_sales_page = _reader(db.get_sales_page)
+get_sales_totals = _reader(db.get_sales_totals)
+get_sales_since = _reader(db.get_sales_since)
+
+
+def iter_sales(start_date=None, end_date=None, chunk_size=db.PAGE_SIZE):
+    """Yield sales newest first, fetching one page at a time."""
+    return _iter_pages(
+        lambda after: get_sales_page(start_date, end_date, after, chunk_size), chunk_size)
+
+
+# --------------- Reports ---------------
+
+get_sales_summary = _reader(db.get_sales_summary)
+get_top_products = _reader(db.get_top_products)
+get_category_sales = _reader(db.get_category_sales)
+get_product_profit = _reader(db.get_product_profit)
+get_dashboard_kpis = _reader(db.get_dashboard_kpis)
+rebuild_sales_daily = _writer(db.rebuild_sales_daily)
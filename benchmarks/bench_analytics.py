@@ -0,0 +1,76 @@
+"""
+bench_analytics.py - Report chart data from analytics.py (NumPy columns) vs SQL.
+
+Generates a scratch database (see generate_data.py), then times the
+first load of the sales columns, a refresh with nothing new, a refresh
+after --new-sales sales, and each report helper in analytics.py next to
+its database.py namesake. Results are checked to match.
+
+    python benchmarks/bench_analytics.py [--sales N] [--products N] [--new-sales N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+import database as db
+from generate_data import generate
+
+REPORTS = ("get_sales_summary", "get_top_products", "get_category_sales",
+           "get_product_profit")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def same(a, b):
+    if isinstance(a, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--new-sales", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "analytics.db")
+        generate(path, args.products, args.sales, 0, verbose=True)
+        db.DB_PATH = path
+
+        _, ms = timed(analytics.get_columns)
+        print(f"\nfirst load of {args.sales:,} sales: {ms / 1000:8.2f} s")
+        _, ms = timed(analytics.get_columns)
+        print(f"refresh, nothing new:     {ms:8.2f} ms")
+        db.record_sales_batch([(1 + i % args.products, 1, 1.0)
+                               for i in range(args.new_sales)])
+        _, ms = timed(analytics.get_columns)
+        print(f"refresh, {args.new_sales:,} new sales: {ms:8.2f} ms\n")
+
+        # The first report after a refresh also sums the columns per product.
+        print(f"{'report':<22}{'numpy ms':>10}{'again':>8}{'sql ms':>10}  same")
+        for name in REPORTS:
+            _, first_ms = timed(getattr(analytics, name))
+            rows, numpy_ms = timed(getattr(analytics, name))
+            expected, sql_ms = timed(getattr(db, name))
+            match = same(sorted(rows, key=str), sorted(expected, key=str))
+            print(f"{name:<22}{first_ms:>10.1f}{numpy_ms:>8.1f}{sql_ms:>10.1f}  {match}")
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+bench_batch_sales.py - Throughput of record_sales_batch() vs. a record_sale() loop.
+
+Replays a synthetic POS file against two scratch databases and reports
+lines/second for each approach.
+
+    python benchmarks/bench_batch_sales.py [--lines N] [--products N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+def fresh_db(directory, name, products):
+    db.DB_PATH = os.path.join(directory, name)
+    db.init_db()
+    for i in range(products):
+        db.add_product(f"Product {i}", f"SKU-{i}", 1, 10.0, 6.0, 10_000_000, 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=50_000)
+    parser.add_argument("--products", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    lines = [(rng.randint(1, args.products), rng.randint(1, 5), 10.0)
+             for _ in range(args.lines)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh_db(tmp, "loop.db", args.products)
+        start = time.perf_counter()
+        for product_id, qty, price in lines:
+            db.record_sale(product_id, qty, price)
+        loop_secs = time.perf_counter() - start
+
+        fresh_db(tmp, "batch.db", args.products)
+        start = time.perf_counter()
+        results = db.record_sales_batch(lines)
+        batch_secs = time.perf_counter() - start
+        db.close_connection()
+
+    assert all(ok for ok, _ in results)
+    print(f"lines:               {args.lines}")
+    print(f"record_sale loop:    {args.lines / loop_secs:>12,.0f} lines/s  ({loop_secs:.2f}s)")
+    print(f"record_sales_batch:  {args.lines / batch_secs:>12,.0f} lines/s  ({batch_secs:.2f}s)")
+    print(f"speedup:             {loop_secs / batch_secs:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
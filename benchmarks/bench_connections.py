@@ -0,0 +1,96 @@
+"""
+bench_connections.py - Per-call latency of connect-per-call vs. pooled connections.
+
+Runs a few read and write helpers against a scratch database twice: once the
+way the helpers used to work (open a connection, set pragmas, query, close)
+and once through database.py's long-lived per-thread connection.
+
+    python benchmarks/bench_connections.py [--calls N]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+def legacy_get_product_by_id(product_id):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON")
+    row = conn.execute("""
+        SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
+               p.quantity, p.low_stock_threshold, p.description,
+               p.created_at, p.updated_at, p.category_id
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        WHERE p.id=?
+    """, (product_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def legacy_get_categories():
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON")
+    rows = conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_add_stock_in(product_id, quantity, note=""):
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("""
+        INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
+        VALUES (?, 'IN', ?, ?, ?)
+    """, (product_id, quantity, note, db.to_timestamp(now)))
+    conn.execute("UPDATE products SET quantity = quantity + ?, updated_at=? WHERE id=?",
+                 (quantity, now, product_id))
+    conn.commit()
+    conn.close()
+
+
+def time_calls(func, args, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples), statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        for i in range(200):
+            db.add_product(f"Product {i}", f"SKU-{i}", 1, 10.0, 6.0, 100, 10)
+
+        cases = [
+            ("get_product_by_id", legacy_get_product_by_id, db.get_product_by_id, (42,)),
+            ("get_categories", legacy_get_categories, db.get_categories, ()),
+            ("add_stock_in", legacy_add_stock_in, db.add_stock_in, (42, 1, "bench")),
+        ]
+        print(f"{'helper':<20}{'legacy p50 us':>16}{'pooled p50 us':>16}{'speedup':>10}")
+        for name, legacy, pooled, call_args in cases:
+            legacy_p50, _ = time_calls(legacy, call_args, args.calls)
+            pooled_p50, _ = time_calls(pooled, call_args, args.calls)
+            print(f"{name:<20}{legacy_p50:>16.1f}{pooled_p50:>16.1f}"
+                  f"{legacy_p50 / pooled_p50:>9.1f}x")
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+bench_group_commit.py - Throughput and latency of group commit at several flush intervals.
+
+Replays a steady stream of scanner events (record_sale calls) from
+--producers threads at --rate events/second in total, first with a
+commit per call and then through a GroupCommitWriter at each of the
+--intervals flush intervals. For each run it reports committed
+events/second, the average batch size, and p50/p99 latency from when
+an event was due to when its commit was confirmed.
+
+    python benchmarks/bench_group_commit.py [--rate N] [--seconds S]
+                                            [--producers N] [--intervals MS,...]
+                                            [--durable]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+from group_commit import GroupCommitWriter
+
+PRODUCTS = 200
+
+
+def make_template(path):
+    db.DB_PATH = path
+    db.init_db()
+    for i in range(PRODUCTS):
+        db.add_product(f"Product {i}", f"SKU-{i}", 1, 10.0, 6.0, 10_000_000, 10)
+    db.close_connection()
+
+
+def producer(index, args, start, record, latencies):
+    """Send this producer's share of the events on schedule."""
+    interval = args.producers / args.rate
+    due = start + index * interval / args.producers
+    deadline = start + args.seconds
+    n = index
+    while due < deadline:
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        record(n % PRODUCTS + 1, due, latencies)
+        due += interval
+        n += args.producers
+    db.close_connection()
+
+
+def run(args, template, tmp, flush_ms):
+    path = os.path.join(tmp, f"run-{flush_ms}.db")
+    shutil.copy(template, path)
+    db.DB_PATH = path
+    latencies = []
+    writer = None
+
+    if flush_ms is None:
+        def record(product_id, due, out):
+            if args.durable:
+                db.get_connection().execute("PRAGMA synchronous = FULL")
+            db.record_sale(product_id, 1, 10.0)
+            out.append(time.perf_counter() - due)
+    else:
+        writer = GroupCommitWriter(flush_ms=flush_ms, durable=args.durable)
+
+        def record(product_id, due, out):
+            writer.record_sale(product_id, 1, 10.0).add_done_callback(
+                lambda _: out.append(time.perf_counter() - due))
+
+    start = time.perf_counter() + 0.2
+    threads = [threading.Thread(target=producer, args=(i, args, start, record, latencies))
+               for i in range(args.producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batches = 0
+    if writer is not None:
+        writer.close()
+        batches = writer.batches
+    elapsed = time.perf_counter() - start
+    committed = db.get_connection().execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    db.close_connection()
+    return committed / elapsed, committed / batches if batches else 1, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=int, default=2000, help="events/second in total")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--intervals", default="0,1,2,5,10,25,50",
+                        help="comma-separated flush intervals in ms")
+    parser.add_argument("--durable", action="store_true",
+                        help="synchronous = FULL: every commit is fsynced")
+    args = parser.parse_args()
+
+    print(f"{args.rate:,} events/s from {args.producers} producers for {args.seconds:g} s, "
+          f"synchronous = {'FULL' if args.durable else 'NORMAL'}\n")
+    print(f"{'mode':<18}{'committed/s':>12}{'avg batch':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        make_template(template)
+        modes = [None] + [float(ms) for ms in args.intervals.split(",")]
+        for flush_ms in modes:
+            rate, batch, latencies = run(args, template, tmp, flush_ms)
+            label = "commit per call" if flush_ms is None else f"group {flush_ms:g} ms"
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000 if latencies else 0
+            print(f"{label:<18}{rate:>12,.0f}{batch:>11,.1f}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+bench_startup.py - Cold-start time to the main window's first paint.
+
+Launches `main.py --measure-startup` repeatedly against a scratch database
+and reports the in-process time to first paint and the wall-clock time of
+each launch (interpreter start to exit).
+
+    python benchmarks/bench_startup.py [--runs N]
+
+Set QT_QPA_PLATFORM=offscreen to run without a display.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    paint_ms, wall_ms = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, INVENTORY_DB=os.path.join(tmp, "startup.db"))
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "main.py"), "--measure-startup"],
+                env=env, capture_output=True, text=True, check=True).stdout
+            wall_ms.append((time.perf_counter() - start) * 1000)
+            paint_ms.extend(float(line.split()[1]) for line in out.splitlines()
+                            if line.startswith("first-paint-ms"))
+
+    print(f"runs:                 {args.runs}")
+    print(f"first paint (median): {statistics.median(paint_ms):8.1f} ms")
+    print(f"process wall (median):{statistics.median(wall_ms):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+check_archives.py - Check that archived years read back the same, however many there are.
+
+Generates a database with sales and stock movements over --years years,
+records what the sales and stock movement helpers return, then archives
+every closed year (see archive.py) and compares. With the default 14
+years there are more archives than SQLite can attach at once (10), so
+the helpers have to read them in batches of database.ARCHIVE_ATTACH_LIMIT.
+Finally it rebuilds the sales_daily rollup and deletes a product, and
+checks that both reach every archive. Exits with status 1 on a mismatch.
+
+    python benchmarks/check_archives.py [--years N] [--products N] [--sales N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+import database as db
+from generate_data import generate
+
+
+def walk_since(chunk_size=1000):
+    """Return every (id, product_id, sale_day, quantity_sold, total) via get_sales_since()."""
+    rows, after_id = [], 0
+    while True:
+        _, page = db.get_sales_since(after_id, chunk_size)
+        rows += page
+        if len(page) < chunk_size:
+            return rows
+        after_id = page[-1][0]
+
+
+def snapshot():
+    """Return {name: result} of the helpers that read archived rows."""
+    now = datetime.now()
+    ranges = {"all": (None, None),
+              "last 90 days": (now - timedelta(days=90), now),
+              "5 years": (now - timedelta(days=5 * 365), now - timedelta(days=365))}
+    results = {}
+    for label, (start, end) in ranges.items():
+        start, end = (None, None) if start is None else (
+            start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"))
+        results[f"get_sales[{label}]"] = db.get_sales(start, end)
+        results[f"iter_sales[{label}]"] = list(db.iter_sales(start, end, chunk_size=997))
+        if start is not None:
+            results[f"get_sales_totals[{label}]"] = tuple(
+                round(value, 4) for value in db.get_sales_totals(start, end))
+    results["get_sales_since"] = walk_since()
+    results["get_stock_movements"] = db.get_stock_movements()
+    results["get_stock_movements[product 1]"] = db.get_stock_movements(1)
+    results["iter_stock_movements"] = list(db.iter_stock_movements(chunk_size=997))
+    results["count_stock_movements"] = db.count_stock_movements()
+    return results
+
+
+def sales_daily():
+    return db.get_connection().execute("""
+        SELECT day, product_id, units, ROUND(revenue, 4), lines
+        FROM sales_daily ORDER BY day, product_id
+    """).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=14)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--sales", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"  {'ok  ' if ok else 'FAIL'}  {name}", flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.db")
+        print(f"== {args.sales:,} sales over {args.years} years: generating...", flush=True)
+        generate(path, args.products, args.sales, movements=args.sales // 5,
+                 days=args.years * 365, seed=args.seed)
+        before = snapshot()
+        rollup = sales_daily()
+
+        started = time.perf_counter()
+        for year in archive.closed_years():
+            archive.archive_year(year)
+        archived = len(db.get_archive_partitions())
+        print(f"== archived {archived} years in {time.perf_counter() - started:.1f} s", flush=True)
+        check(f"more archives ({archived}) than ARCHIVE_ATTACH_LIMIT ({db.ARCHIVE_ATTACH_LIMIT})",
+              archived > db.ARCHIVE_ATTACH_LIMIT)
+
+        after = snapshot()
+        for name, result in before.items():
+            check(f"{name}: {len(result) if isinstance(result, list) else result}",
+                  after[name] == result)
+
+        db.rebuild_sales_daily()
+        check("rebuild_sales_daily", sales_daily() == rollup)
+
+        product_id = before["get_sales_since"][0][1]
+        db.delete_product(product_id)
+        conn = db.get_connection()
+        left = sum(
+            conn.execute(f"SELECT COUNT(*) FROM {schema}.sales WHERE product_id=?",
+                         (product_id,)).fetchone()[0]
+            for archives in db._archives() for schema, _ in archives)
+        check("delete_product clears every archive", left == 0)
+        db.close_connection()
+
+    print("all checks passed" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+generate_data.py - Populate an inventory database with synthetic data.
+
+Creates products spread over categories, then sales and stock movements
+spread over the last --days days in date order. Product popularity
+follows a Zipf distribution (--skew), so a few best sellers account for
+most sales, as in a real shop. The same --seed always produces the same
+database.
+
+    python benchmarks/generate_data.py [--db PATH] [--products N] [--sales N]
+                                       [--movements N] [--days N] [--skew S]
+
+Rows are bulk-inserted in chunks inside one transaction per table; the
+rollup, search index and change-counter triggers still fire, so the
+result is indistinguishable from data entered through the app. Sales do
+not decrement stock, so quantities stay as generated.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+CHUNK_SIZE = 50_000
+
+WORDS = ["Classic", "Deluxe", "Mini", "Pro", "Eco", "Smart", "Ultra", "Basic",
+         "Premium", "Compact", "Wireless", "Organic", "Steel", "Cotton", "Wooden"]
+NOUNS = ["Widget", "Lamp", "Chair", "Notebook", "Shirt", "Kettle", "Cable",
+         "Bottle", "Desk", "Pen", "Speaker", "Mug", "Backpack", "Charger", "Tea"]
+
+
+def zipf_weights(n, skew):
+    """Cumulative Zipf weights for ranks 1..n (rank 1 is the most popular)."""
+    return list(itertools.accumulate(1.0 / rank ** skew for rank in range(1, n + 1)))
+
+
+def _timestamps(rng, count, days):
+    """`count` ascending timestamps (see database.to_timestamp) over the last `days` days."""
+    end = db.to_timestamp()
+    start = end - days * db.DAY
+    step = (end - start) / max(count, 1)
+    for i in range(count):
+        yield start + int(i * step + rng.random() * step)
+
+
+def _insert_chunks(conn, sql, rows):
+    for chunk in iter(lambda: list(itertools.islice(rows, CHUNK_SIZE)), []):
+        conn.executemany(sql, chunk)
+
+
+def generate(path, products=10_000, sales=100_000, movements=20_000,
+             days=365, skew=1.1, seed=42, verbose=False):
+    """Create (or extend) the database at `path` with synthetic rows."""
+    rng = random.Random(seed)
+    db.DB_PATH = path
+    db.init_db()
+
+    def log(message):
+        if verbose:
+            print(message, flush=True)
+
+    category_ids = [cat_id for cat_id, _ in db.get_categories()]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    started = time.perf_counter()
+    with db.transaction(immediate=True) as conn:
+        first_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) + 1 FROM products").fetchone()[0]
+        prices = {}
+
+        def product_rows():
+            for i in range(products):
+                price = round(rng.lognormvariate(3.5, 1.0), 2)
+                prices[first_id + i] = price
+                quantity = rng.randint(0, 500)
+                yield (f"{rng.choice(WORDS)} {rng.choice(NOUNS)} {first_id + i}",
+                       f"GEN-{seed}-{first_id + i}", rng.choice(category_ids),
+                       price, round(price * rng.uniform(0.4, 0.8), 2),
+                       quantity, rng.choice((5, 10, 20, 50)),
+                       f"Synthetic product {first_id + i}", now, now)
+
+        _insert_chunks(conn, """
+            INSERT INTO products (name, sku, category_id, price, cost_price,
+                                  quantity, low_stock_threshold, description,
+                                  created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, product_rows())
+    log(f"products:   {products:>12,}  ({time.perf_counter() - started:.1f}s)")
+
+    # Popularity rank -> product id, shuffled so best sellers are not
+    # simply the oldest products.
+    ids = list(prices)
+    rng.shuffle(ids)
+    cum_weights = zipf_weights(len(ids), skew)
+
+    def pick(count):
+        return rng.choices(ids, cum_weights=cum_weights, k=count)
+
+    started = time.perf_counter()
+    with db.transaction(immediate=True) as conn:
+        def sale_rows():
+            stamps = _timestamps(rng, sales, days)
+            for remaining in range(sales, 0, -CHUNK_SIZE):
+                for product_id in pick(min(CHUNK_SIZE, remaining)):
+                    qty = min(int(rng.paretovariate(2.0)), 50)
+                    price = prices[product_id]
+                    yield product_id, qty, price, round(qty * price, 2), next(stamps)
+
+        _insert_chunks(conn, """
+            INSERT INTO sales (product_id, quantity_sold, sale_price, total, sale_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, sale_rows())
+    log(f"sales:      {sales:>12,}  ({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    with db.transaction(immediate=True) as conn:
+        def movement_rows():
+            stamps = _timestamps(rng, movements, days)
+            for remaining in range(movements, 0, -CHUNK_SIZE):
+                for product_id in pick(min(CHUNK_SIZE, remaining)):
+                    if rng.random() < 0.7:
+                        yield product_id, "IN", rng.randint(10, 200), "Restock", next(stamps)
+                    else:
+                        yield product_id, "OUT", rng.randint(1, 20), "Adjustment", next(stamps)
+
+        _insert_chunks(conn, """
+            INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, movement_rows())
+    log(f"movements:  {movements:>12,}  ({time.perf_counter() - started:.1f}s)")
+
+    db.get_connection().execute("PRAGMA optimize")
+    db.close_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=db.DB_PATH,
+                        help="database file (default: the app's database)")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--sales", type=int, default=100_000)
+    parser.add_argument("--movements", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--skew", type=float, default=1.1,
+                        help="Zipf exponent of product popularity (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.db, args.products, args.sales, args.movements,
+             args.days, args.skew, args.seed, verbose=True)
+    print(f"wrote {args.db}")
+
+
+if __name__ == "__main__":
+    main()
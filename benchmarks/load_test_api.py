@@ -0,0 +1,157 @@
+"""
+load_test_api.py - Throughput and latency of api_server.py under concurrent load.
+
+Starts api_server.py on a generated scratch database (see generate_data.py)
+unless --port points at a running server, then opens --connections
+keep-alive connections that each pipeline --pipeline requests at a time
+for --seconds. A --write-ratio share of requests are POST /sales; the
+rest are a mix of product lookups, searches and page reads. Reports
+requests/second and p50/p99 latency for reads and writes.
+
+    python benchmarks/load_test_api.py [--connections N] [--pipeline N]
+                                       [--seconds S] [--write-ratio R]
+                                       [--port PORT] [--readers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_data import generate
+
+WORDS = ["widget", "lamp", "pro", "eco chair", "steel", "mug", "ca"]
+
+
+def make_request(rng, products, write_ratio):
+    if rng.random() < write_ratio:
+        body = json.dumps({"product_id": rng.randint(1, products),
+                           "quantity": 1, "price": 9.5}).encode()
+        return "write", (b"POST /sales HTTP/1.1\r\nHost: x\r\n"
+                         b"Content-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    choice = rng.random()
+    if choice < 0.5:
+        path = f"/products/{rng.randint(1, products)}"
+    elif choice < 0.75:
+        path = f"/search?q={rng.choice(WORDS).replace(' ', '+')}&limit=20"
+    elif choice < 0.9:
+        path = "/products?limit=50"
+    else:
+        path = "/reports/kpis"
+    return "read", f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode()
+
+
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, args, seed, deadline, stats):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.perf_counter() < deadline:
+        batch = [make_request(rng, args.products, args.write_ratio)
+                 for _ in range(args.pipeline)]
+        start = time.perf_counter()
+        writer.write(b"".join(request for _, request in batch))
+        await writer.drain()
+        for kind, _ in batch:
+            status = await read_response(reader)
+            elapsed = (time.perf_counter() - start) * 1000
+            stats[kind].append(elapsed)
+            if status >= 500 or (status >= 400 and status != 409):
+                stats["errors"].append(status)
+            elif status == 409:
+                stats["refused"].append(status)
+    writer.close()
+
+
+async def run_load(port, args):
+    stats = {"read": [], "write": [], "errors": [], "refused": []}
+    deadline = time.perf_counter() + args.seconds
+    await asyncio.gather(*(client(port, args, seed, deadline, stats)
+                           for seed in range(args.connections)))
+    return stats
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def report(stats, seconds):
+    total = len(stats["read"]) + len(stats["write"])
+    print(f"requests:      {total:,}  ({total / seconds:,.0f}/s)")
+    for kind in ("read", "write"):
+        samples = sorted(stats[kind])
+        if samples:
+            print(f"{kind + 's':<6}  {len(samples) / seconds:>10,.0f}/s   "
+                  f"p50 {statistics.median(samples):7.2f} ms   "
+                  f"p99 {samples[int(0.99 * (len(samples) - 1))]:7.2f} ms")
+    print(f"409 (no stock): {len(stats['refused']):,}   errors: {len(stats['errors']):,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--pipeline", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--port", type=int,
+                        help="test a server already running on this port")
+    parser.add_argument("--readers", type=int, default=8,
+                        help="database reader threads of the server started here")
+    args = parser.parse_args()
+
+    if args.port:
+        stats = asyncio.run(run_load(args.port, args))
+        report(stats, args.seconds)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "api.db")
+        generate(path, args.products, 100_000, 10_000)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api_server.py"),
+             "--port", str(port), "--readers", str(args.readers)],
+            env=dict(os.environ, INVENTORY_DB=path), stdout=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            stats = asyncio.run(run_load(port, args))
+        finally:
+            server.terminate()
+            server.wait()
+    report(stats, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+run_benchmarks.py - Latency and memory of the database.py API at several data sizes.
+
+For each size a scratch database is generated (see generate_data.py) and
+every public query and write helper is called repeatedly. Per function it
+records p50 / p99 / max latency and the peak Python memory of one call
+(tracemalloc, measured on a separate call so it does not skew timings).
+
+    python benchmarks/run_benchmarks.py [--sizes 1000x10000,10000x100000]
+                                        [--repeat N] [--output results.json]
+                                        [--compare baseline.json]
+
+Sizes are PRODUCTSxSALES. Results are written as JSON together with the
+git revision, Python and SQLite versions, so runs from two versions can
+be compared with --compare, which flags functions whose p50 regressed by
+more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+from generate_data import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Unbounded reads return whole tables; they run fewer times, and not at
+# all with --skip-full-scans.
+FULL_SCANS = {"get_all_products", "get_sales", "get_stock_movements",
+              "iter_products", "iter_sales", "iter_stock_movements"}
+
+
+def benchmark_cases(products, rng):
+    """Return [(name, call)] for every public database.py function.
+
+    `call(i)` runs one iteration; `i` lets writes use fresh keys.
+    """
+    def product():
+        return rng.randint(1, products)
+
+    week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S")
+    today = datetime.now().strftime("%Y-%m-%d 23:59:59")
+    words = ["widget", "lamp", "pro chair", "eco", "ca", "premium steel mug"]
+    sale_page = db.get_sales_page(limit=1)[0]
+    movement_page = db.get_stock_movements_page(limit=1)[0]
+    product_page = db.get_products_page(limit=1)[0]
+    category = db.get_categories()[0][0]
+    batch = [(product(), 1, 10.0) for _ in range(100)]
+
+    def add_and_delete_product(i):
+        db.add_product(f"Bench {i}", f"BENCH-{i}", category, 9.99, 5.0, 10, 5)
+        pid = db.get_connection().execute(
+            "SELECT id FROM products WHERE sku = ?", (f"BENCH-{i}",)).fetchone()[0]
+        db.delete_product(pid)
+
+    def update_product(i):
+        p = db.get_product_by_id(product())
+        db.update_product(p[0], p[1], p[2], p[11], p[4], p[5], p[6], p[7], p[8])
+
+    return [
+        ("get_data_version", lambda i: db.get_data_version()),
+        ("get_table_versions", lambda i: db.get_table_versions()),
+        ("get_schema_version", lambda i: db.get_schema_version()),
+        ("get_categories", lambda i: db.get_categories()),
+        ("get_all_products", lambda i: db.get_all_products()),
+        ("get_products_page", lambda i: db.get_products_page(product_page)),
+        ("iter_products", lambda i: sum(1 for _ in db.iter_products())),
+        ("search_products", lambda i: db.search_products(words[i % len(words)])),
+        ("get_low_stock_products", lambda i: db.get_low_stock_products()),
+        ("get_product_by_id", lambda i: db.get_product_by_id(product())),
+        ("get_sales", lambda i: db.get_sales()),
+        ("get_sales[last 7 days]", lambda i: db.get_sales(week_ago, today)),
+        ("get_sales_page", lambda i: db.get_sales_page(after=sale_page)),
+        ("get_sales_page[last 7 days]", lambda i: db.get_sales_page(week_ago, today)),
+        ("iter_sales", lambda i: sum(1 for _ in db.iter_sales())),
+        ("get_sales_totals", lambda i: db.get_sales_totals()),
+        ("get_sales_totals[last 7 days]", lambda i: db.get_sales_totals(week_ago, today)),
+        ("get_sales_summary", lambda i: db.get_sales_summary()),
+        ("get_top_products", lambda i: db.get_top_products()),
+        ("get_category_sales", lambda i: db.get_category_sales()),
+        ("get_product_profit", lambda i: db.get_product_profit()),
+        ("get_dashboard_kpis", lambda i: db.get_dashboard_kpis()),
+        ("get_stock_movements", lambda i: db.get_stock_movements()),
+        ("get_stock_movements[product]", lambda i: db.get_stock_movements(product())),
+        ("get_stock_movements_page", lambda i: db.get_stock_movements_page(after=movement_page)),
+        ("iter_stock_movements", lambda i: sum(1 for _ in db.iter_stock_movements())),
+        ("count_stock_movements", lambda i: db.count_stock_movements()),
+        ("record_sale", lambda i: db.record_sale(product(), 1, 10.0)),
+        ("record_sales_batch[100]", lambda i: db.record_sales_batch(batch)),
+        ("add_stock_in", lambda i: db.add_stock_in(product(), 5, "bench")),
+        ("add_stock_out", lambda i: db.add_stock_out(product(), 1, "bench")),
+        ("add_category", lambda i: db.add_category(f"Bench {time.time_ns()}")),
+        ("add_product+delete_product", add_and_delete_product),
+        ("update_product", update_product),
+    ]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def measure(call, repeat):
+    call(-1)    # warm the page cache and statement cache
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    call(repeat)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "p50_ms": round(statistics.median(samples), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "max_ms": round(max(samples), 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_size(directory, products, sales, args):
+    path = os.path.join(directory, f"bench_{products}x{sales}.db")
+    print(f"== {products:,} products x {sales:,} sales: generating...", flush=True)
+    generate(path, products, sales, movements=sales // 5, seed=args.seed)
+    db.DB_PATH = path
+    rng = random.Random(args.seed)
+    results = {}
+    for name, call in benchmark_cases(products, rng):
+        full_scan = name in FULL_SCANS
+        if full_scan and args.skip_full_scans:
+            continue
+        results[name] = measure(call, args.full_scan_repeat if full_scan else args.repeat)
+        r = results[name]
+        print(f"  {name:<32} p50 {r['p50_ms']:>10.3f} ms   p99 {r['p99_ms']:>10.3f} ms"
+              f"   peak {r['peak_kib']:>10,.1f} KiB", flush=True)
+    db.close_connection()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold, min_ms):
+    """Print functions whose p50 moved by more than `threshold` vs. a baseline.
+
+    Calls faster than `min_ms` in both runs are ignored; at that scale the
+    difference is timer noise. Returns the number of regressions.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["sizes"]
+    print(f"\n== compared with {baseline_path} (threshold {threshold:.0%})")
+    regressions = 0
+    for size, functions in results.items():
+        for name, r in functions.items():
+            old = baseline.get(size, {}).get(name)
+            if not old or max(old["p50_ms"], r["p50_ms"]) < min_ms:
+                continue
+            ratio = r["p50_ms"] / old["p50_ms"]
+            if abs(ratio - 1) > threshold:
+                flag = "SLOWER" if ratio > 1 else "faster"
+                regressions += ratio > 1
+                print(f"  {size:<16} {name:<32} {old['p50_ms']:>9.3f} -> "
+                      f"{r['p50_ms']:>9.3f} ms  ({ratio:.2f}x {flag})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000x10000,10000x100000",
+                        help="comma-separated PRODUCTSxSALES sizes")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--full-scan-repeat", type=int, default=5)
+    parser.add_argument("--skip-full-scans", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative p50 change reported by --compare")
+    parser.add_argument("--min-ms", type=float, default=0.1,
+                        help="ignore functions faster than this in --compare")
+    args = parser.parse_args()
+
+    sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes.split(",")]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for products, sales in sizes:
+            results[f"{products}x{sales}"] = run_size(tmp, products, sales, args)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "sizes": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold, args.min_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+stress_checkout.py - Concurrent checkouts from several processes on one database.
+
+Starts --workers processes that all sell from the same small set of
+products through database.record_sale(), as several tills sharing
+inventory.db would. Stock is deliberately scarce so that the tills race
+for the last units. Reports committed sales/second, per-sale latency and
+the number of sales refused for lack of stock, then checks that nothing
+was oversold: every product's stock plus its sold units must add up to
+its starting stock, and no stock may be negative.
+
+    python benchmarks/stress_checkout.py [--workers N] [--seconds S]
+                                         [--products N] [--stock N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+def till(path, seconds, products, seed, start_at, results):
+    db.DB_PATH = path
+    rng = random.Random(seed)
+    latencies, refused, errors = [], 0, 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        product_id = rng.randint(1, products)
+        start = time.perf_counter()
+        try:
+            db.record_sale(product_id, rng.randint(1, 3), 10.0)
+            latencies.append(time.perf_counter() - start)
+        except db.InsufficientStockError:
+            refused += 1
+        except sqlite3.Error:
+            errors += 1
+    db.close_connection()
+    results.put((latencies, refused, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=300,
+                        help="starting units per product")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkout.db")
+        db.DB_PATH = path
+        db.init_db()
+        for i in range(args.products):
+            db.add_product(f"Product {i}", f"SKU-{i}", 1, 10.0, 6.0, args.stock, 10)
+        db.close_connection()
+
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        workers = [multiprocessing.Process(
+                       target=till,
+                       args=(path, args.seconds, args.products, seed, start_at, results))
+                   for seed in range(args.workers)]
+        for w in workers:
+            w.start()
+        outcomes = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+
+        conn = sqlite3.connect(path)
+        negative = conn.execute(
+            "SELECT COUNT(*) FROM products WHERE quantity < 0").fetchone()[0]
+        mismatched = conn.execute("""
+            SELECT COUNT(*) FROM products p
+            WHERE p.quantity + COALESCE(
+                (SELECT SUM(quantity_sold) FROM sales WHERE product_id = p.id), 0) != ?
+        """, (args.stock,)).fetchone()[0]
+        sold_out = conn.execute(
+            "SELECT COUNT(*) FROM products WHERE quantity = 0").fetchone()[0]
+        conn.close()
+
+    latencies = [lat * 1000 for outcome in outcomes for lat in outcome[0]]
+    committed = len(latencies)
+    refused = sum(outcome[1] for outcome in outcomes)
+    errors = sum(outcome[2] for outcome in outcomes)
+    latencies.sort()
+
+    print(f"workers:            {args.workers}")
+    print(f"committed sales:    {committed:,}  ({committed / args.seconds:,.0f}/s)")
+    if latencies:
+        print(f"latency p50 / p99:  {statistics.median(latencies):.2f} / "
+              f"{latencies[int(0.99 * (len(latencies) - 1))]:.2f} ms")
+    print(f"refused (no stock): {refused:,}   products sold out: {sold_out}/{args.products}")
+    print(f"lock errors:        {errors}")
+    print(f"oversold products:  {negative}   stock/sales mismatches: {mismatched}")
+    if negative or mismatched or errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,17 @@ dashboard.py - Dashboard / Home page showing key stats and charts.
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QGridLayout,
-    QSizePolicy, QTableWidget, QTableWidgetItem, QHeaderView
+    QSizePolicy, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
 )
 from PyQt5.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+import analytics
 import database as db
+import forecasting
+from data_events import DataWatcher
+from workers import get_loader
 
 
 class StatCard(QFrame):
@@ -58,8 +62,18 @@ class MiniChart(FigureCanvas):
 class DashboardPage(QWidget):
     """The main dashboard page."""
 
+    # Tables the dashboard reads; it is reloaded only when one changes.
+    DATA_TABLES = ("categories", "products", "sales")
+
+    # DataLoader key of every load of this page, opened or reloaded.
+    LOADER_KEY = "dashboard"
+
+    # Projected stockouts listed, soonest first; the Stock page has more.
+    STOCKOUT_ROWS = 20
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.watcher = DataWatcher(self.DATA_TABLES)
         self.setup_ui()
 
     def setup_ui(self):
@@ -126,35 +140,76 @@ class DashboardPage(QWidget):
         self.low_stock_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.low_stock_table.setMaximumHeight(200)
         lf_layout.addWidget(self.low_stock_table)
-        layout.addWidget(low_frame)
+        tables_row = QHBoxLayout()
+        tables_row.setSpacing(16)
+        tables_row.addWidget(low_frame)
+
+        # Projected stockouts table
+        out_frame = QFrame()
+        out_frame.setStyleSheet("QFrame { background: white; border: 1px solid #dadce0; border-radius: 8px; }")
+        of_layout = QVBoxLayout(out_frame)
+        of_layout.setContentsMargins(16, 16, 16, 16)
+        of_label = QLabel(f"📉  Projected Stockouts (Next {forecasting.STOCKOUT_HORIZON_DAYS} Days)")
+        of_label.setStyleSheet("font-weight: bold; font-size: 14px; color: #f4b400; border: none;")
+        of_layout.addWidget(of_label)
+
+        self.stockout_table = QTableWidget()
+        self.stockout_table.setColumnCount(4)
+        self.stockout_table.setHorizontalHeaderLabels(
+            ["Product", "Qty", "Demand / Day", "Stockout Date"])
+        self.stockout_table.horizontalHeader().setStretchLastSection(True)
+        self.stockout_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.stockout_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stockout_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.stockout_table.setMaximumHeight(200)
+        of_layout.addWidget(self.stockout_table)
+        tables_row.addWidget(out_frame)
+        layout.addLayout(tables_row)
 
     def refresh(self):
-        """Reload all dashboard data."""
+        """Reload all dashboard data off the GUI thread."""
+        get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                            self.show_load_error)
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Error", message)
+
+    def is_stale(self):
+        return self.watcher.is_stale()
+
+    def load_data(self):
+        """Query everything the dashboard shows; safe off the GUI thread."""
+        return (self.watcher.versions(),
+                db.get_dashboard_kpis(), db.get_low_stock_products(),
+                analytics.get_sales_summary(), analytics.get_category_sales(),
+                forecasting.get_projected_stockouts(limit=self.STOCKOUT_ROWS))
+
+    def show_data(self, data):
+        versions, kpis, low_stock, summary, cat_data, stockouts = data
+        self.watcher.mark(versions)
+
         # Clear stat cards
         while self.cards_layout.count():
             item = self.cards_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
 
-        products = db.get_all_products()
-        low_stock = db.get_low_stock_products()
-        sales = db.get_sales()
-        total_revenue = sum(s[4] for s in sales) if sales else 0
-        total_items = sum(p[6] for p in products) if products else 0
+        (product_count, total_items, low_stock_count,
+         total_revenue, today_revenue, total_sales) = kpis
 
         cards = [
-            ("Total Products", len(products), "#1a73e8"),
+            ("Total Products", product_count, "#1a73e8"),
             ("Total Stock", total_items, "#0f9d58"),
-            ("Low Stock Items", len(low_stock), "#db4437"),
+            ("Low Stock Items", low_stock_count, "#db4437"),
             ("Total Revenue", f"₹{total_revenue:,.2f}", "#f4b400"),
-            ("Total Sales", len(sales), "#8e24aa"),
+            ("Today's Revenue", f"₹{today_revenue:,.2f}", "#00bcd4"),
+            ("Total Sales", total_sales, "#8e24aa"),
         ]
         for title, value, color in cards:
             self.cards_layout.addWidget(StatCard(title, value, color))
 
         # Sales chart
         self.sales_chart.axes.clear()
-        summary = db.get_sales_summary()
         if summary:
             days = [row[0][5:] for row in summary]  # MM-DD
             revenues = [row[1] for row in summary]
@@ -175,7 +230,6 @@ class DashboardPage(QWidget):
 
         # Category pie
         self.cat_chart.axes.clear()
-        cat_data = db.get_category_sales()
         if cat_data:
             labels = [r[0] or "Uncategorized" for r in cat_data]
             values = [r[1] for r in cat_data]
@@ -205,3 +259,15 @@ class DashboardPage(QWidget):
                     item.setForeground(Qt.red)
                 item.setTextAlignment(Qt.AlignCenter)
                 self.low_stock_table.setItem(row, col, item)
+
+        # Projected stockouts table
+        self.stockout_table.setRowCount(len(stockouts))
+        for row, row_data in enumerate(stockouts):
+            # id, name, sku, category, qty, forecast, velocity, safety, reorder point, date
+            items = [row_data[1], str(row_data[4]), f"{row_data[5]:.1f}", row_data[9] or "N/A"]
+            for col, val in enumerate(items):
+                item = QTableWidgetItem(val)
+                if col == 3:  # stockout date column
+                    item.setForeground(Qt.red)
+                item.setTextAlignment(Qt.AlignCenter)
+                self.stockout_table.setItem(row, col, item)
@@ -0,0 +1,69 @@
+"""
+data_events.py - Change notifications for the pages.
+
+Every write to a tracked table bumps that table's counter in
+table_versions (see database.py). A DataWatcher remembers the counters
+behind what a page currently shows, so the page can tell whether any of
+its tables changed since it last loaded and skip the reload if not.
+DataEvents polls the counters on the GUI thread and announces which
+tables changed, for views that should react to writes made elsewhere.
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import database as db
+
+
+class DataWatcher:
+    """Tracks the table versions a view last loaded its data at."""
+
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+        self.loaded = None
+
+    def versions(self):
+        """Return the watched tables' current versions; safe off the GUI thread.
+
+        Read this before querying the data, so a write that lands in
+        between makes the view stale rather than silently missed.
+        """
+        versions = db.get_table_versions(self.tables)
+        return tuple(versions[table] for table in self.tables)
+
+    def mark(self, versions):
+        """Record that the data on screen was loaded at `versions`."""
+        self.loaded = versions
+
+    def is_stale(self):
+        return self.versions() != self.loaded
+
+
+class DataEvents(QObject):
+    """Announces which tracked tables changed since the previous poll."""
+
+    tables_changed = pyqtSignal(object)     # frozenset of table names
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.versions = None
+
+    def poll(self):
+        """Re-read the table versions and emit tables_changed if any moved."""
+        versions = db.get_table_versions()
+        previous, self.versions = self.versions, versions
+        if previous is not None:
+            changed = frozenset(table for table, version in versions.items()
+                                if previous.get(table) != version)
+            if changed:
+                self.tables_changed.emit(changed)
+
+
+_events = None
+
+
+def get_events():
+    """Return the application-wide DataEvents, creating it on first use."""
+    global _events
+    if _events is None:
+        _events = DataEvents()
+    return _events
@@ -3,27 +3,275 @@ database.py - SQLite database layer for the Smart Inventory Management System.
 Handles all CRUD operations for products, stock movements, and sales.
 """
 
+import bisect
+import heapq
+import random
 import sqlite3
 import os
-from datetime import datetime
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from operator import itemgetter
 
+import query_stats
 
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventory.db")
+
+DB_PATH = os.environ.get(
+    "INVENTORY_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventory.db"))
+
+# Pragmas applied once when a connection is opened. WAL lets readers run
+# alongside a writer; NORMAL sync is durable across application crashes in
+# WAL mode and avoids an fsync on every commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Default number of rows per page for the paginated / streaming helpers.
+PAGE_SIZE = 500
+
+# How long a statement waits on another connection's lock before failing
+# with "database is locked", and how often a stock write then starts over.
+BUSY_TIMEOUT = 5.0
+BUSY_RETRIES = 4
+
+# sales.sale_date and stock_movements.created_at hold whole seconds since
+# 1970-01-01 00:00 on the local wall clock (not UTC), so whole days are
+# local days: sales.sale_day and sales_daily.day are timestamp // DAY.
+# In SQL, datetime(x, 'unixepoch') gives back 'YYYY-MM-DD HH:MM:SS' text.
+DAY = 86400
+_EPOCH = datetime(1970, 1, 1)
+
+_local = threading.local()
+
+# transaction() commits made by this process; see get_data_version().
+_commit_count = 0
+
+
+class InsufficientStockError(ValueError):
+    """A sale or stock-out asked for more units than the product has."""
+
+    def __init__(self, product_id, requested, available):
+        super().__init__(f"Only {available} units available.")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+class UnknownProductError(ValueError):
+    """A write referred to a product id that does not exist."""
+
+    def __init__(self, product_id):
+        super().__init__(f"Unknown product id {product_id}")
+        self.product_id = product_id
+
+
+def to_timestamp(value=None):
+    """Return `value` as a stored timestamp (see DAY); None means now.
+
+    Accepts a datetime, a date (its midnight), 'YYYY-MM-DD[ HH:MM[:SS]]'
+    text, or a timestamp, which is returned unchanged.
+    """
+    if value is None:
+        value = datetime.now()
+    elif isinstance(value, int):
+        return value
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return (value.replace(tzinfo=None) - _EPOCH) // timedelta(seconds=1)
+
+
+def _open_connection(path):
+    factory = (query_stats.InstrumentedConnection if query_stats.enabled
+               else sqlite3.Connection)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                           factory=factory)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
 def get_connection():
-    """Return a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON")
+    """Return this thread's long-lived connection, opening it on first use.
+
+    Connections are kept per thread (sqlite3 connections must not be shared
+    across threads) and reopened if DB_PATH changes, or, between
+    transactions, if instrumentation was switched on or off. Do not close
+    the returned connection; use close_connection() instead.
+    """
+    conn = getattr(_local, "conn", None)
+    if (conn is None or _local.path != DB_PATH
+            or (isinstance(conn, query_stats.InstrumentedConnection) != query_stats.enabled
+                and not conn.in_transaction)):
+        if conn is not None:
+            conn.close()
+        conn = _open_connection(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+        _local.depth = 0
+        _local.after_commit = []
+        _local.table_versions = None
+        _local.archives = None
+        _local.attached = OrderedDict()
     return conn
 
 
-def init_db():
-    """Create tables if they do not exist."""
+def enable_instrumentation(slow_ms=None, log_path=None):
+    """Time every statement and log slow ones; see query_stats.
+
+    Each thread's connection is reopened instrumented on its next use.
+    """
+    query_stats.enable(slow_ms, log_path)
+
+
+def disable_instrumentation():
+    query_stats.disable()
+
+
+def close_connection():
+    """Close the calling thread's connection, if it has one."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Run a block of statements as one transaction on this thread's connection.
+
+    Commits on success and rolls back on error. Nested blocks become
+    savepoints, so a helper that opens its own transaction can be called
+    from inside a larger one. `immediate` takes the write lock up front
+    (BEGIN IMMEDIATE) instead of on the first write.
+
+    Callbacks appended to _local.after_commit inside the block run once the
+    outermost transaction has committed, and are dropped if the block they
+    were added in rolls back.
+    """
+    conn = get_connection()
+    depth = _local.depth
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        _local.after_commit = []
+    else:
+        conn.execute(f"SAVEPOINT sp_{depth}")
+    pending = len(_local.after_commit)
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        del _local.after_commit[pending:]
+        if depth == 0:
+            conn.execute("ROLLBACK")
+            # Counters cached mid-transaction may include the undone writes.
+            _local.table_versions = None
+        else:
+            conn.execute(f"ROLLBACK TO sp_{depth}")
+            conn.execute(f"RELEASE sp_{depth}")
+        raise
+    _local.depth = depth
+    if depth == 0:
+        global _commit_count
+        callbacks, _local.after_commit = _local.after_commit, []
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        _commit_count += 1
+        for callback in callbacks:
+            callback()
+    else:
+        conn.execute(f"RELEASE sp_{depth}")
+
+
+def get_data_version():
+    """Return a token that changes whenever the database may have changed.
+
+    Combines PRAGMA data_version, which moves when another connection
+    commits, with this process's count of transaction() commits and the
+    rows this thread's connection has changed, which also covers writes
+    made outside transaction() (each one commits on its own). The pragma
+    and the row count are per-connection, so only compare tokens taken on
+    the same thread.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    return data_version, _commit_count, conn.total_changes
+
+
+def get_table_versions(tables=None):
+    """Return {table: change counter} for the given tracked tables.
+
+    The counters are re-read only when get_data_version() has moved since
+    the last call on this thread, so polling an idle database costs a
+    single pragma.
+    """
+    token = get_data_version()
+    cached = getattr(_local, "table_versions", None)
+    if cached is None or cached[0] != token:
+        versions = dict(get_connection().execute(
+            "SELECT name, version FROM table_versions").fetchall())
+        _local.table_versions = cached = (token, versions)
+    return {table: cached[1].get(table, 0) for table in tables or TRACKED_TABLES}
+
+
+# --------------- Schema migrations ---------------
+
+# Tables whose writes are counted in table_versions (migration 6).
+TRACKED_TABLES = ("categories", "products", "sales", "stock_movements")
+
+
+def _version_triggers(table):
+    """SQL for the triggers that bump `table`'s row in table_versions."""
+    return "".join(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+    AFTER {event} ON {table}
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+    END;
+    """ for event in ("INSERT", "UPDATE", "DELETE"))
+
+# Triggers keeping sales_totals (migration 7) in step with sales_daily.
+_SALES_TOTALS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_sales_totals_insert AFTER INSERT ON sales_daily
+    BEGIN
+        UPDATE sales_totals SET revenue = revenue + NEW.revenue, lines = lines + NEW.lines;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_totals_update
+    AFTER UPDATE OF revenue, lines ON sales_daily
+    BEGIN
+        UPDATE sales_totals SET revenue = revenue + NEW.revenue - OLD.revenue,
+                                lines = lines + NEW.lines - OLD.lines;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_totals_delete AFTER DELETE ON sales_daily
+    BEGIN
+        UPDATE sales_totals SET revenue = revenue - OLD.revenue, lines = lines - OLD.lines;
+    END;
+"""
+
+# Each entry upgrades the schema by one version. The version a database is at
+# is stored in PRAGMA user_version, so startup only runs the steps it has not
+# seen yet. Never edit a migration that has shipped; append a new one.
 
-    cursor.executescript("""
+MIGRATIONS = [
+    # 1: base tables and default categories
+    """
     CREATE TABLE IF NOT EXISTS categories (
         id          INTEGER PRIMARY KEY AUTOINCREMENT,
         name        TEXT    NOT NULL UNIQUE
@@ -63,34 +311,740 @@ def init_db():
         created_at      TEXT    NOT NULL,
         FOREIGN KEY (product_id) REFERENCES products(id)
     );
-    """)
 
-    # Seed default categories if empty
-    cursor.execute("SELECT COUNT(*) FROM categories")
-    if cursor.fetchone()[0] == 0:
-        default_cats = ["Electronics", "Clothing", "Food & Beverages",
-                        "Stationery", "Furniture", "Other"]
-        cursor.executemany("INSERT INTO categories (name) VALUES (?)",
-                           [(c,) for c in default_cats])
+    INSERT INTO categories (name)
+    SELECT column1 FROM (VALUES ('Electronics'), ('Clothing'), ('Food & Beverages'),
+                                ('Stationery'), ('Furniture'), ('Other'))
+    WHERE NOT EXISTS (SELECT 1 FROM categories);
+    """,
 
-    conn.commit()
-    conn.close()
+    # 2: secondary indexes for date ranges and per-product lookups
+    """
+    CREATE INDEX IF NOT EXISTS idx_sales_sale_date
+        ON sales(sale_date);
+    CREATE INDEX IF NOT EXISTS idx_sales_product_date
+        ON sales(product_id, sale_date);
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_product_created
+        ON stock_movements(product_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_products_category
+        ON products(category_id);
+    """,
 
+    # 3: sales_daily rollup, kept in step with sales by triggers
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day             TEXT    NOT NULL,
+        product_id      INTEGER NOT NULL,
+        units           INTEGER NOT NULL DEFAULT 0,
+        revenue         REAL    NOT NULL DEFAULT 0.0,
+        lines           INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID;
 
-# --------------- Category helpers ---------------
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_insert AFTER INSERT ON sales
+    BEGIN
+        INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+        VALUES (DATE(NEW.sale_date), NEW.product_id, NEW.quantity_sold, NEW.total, 1)
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            lines = lines + 1;
+    END;
 
-def get_categories():
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_delete AFTER DELETE ON sales
+    BEGIN
+        UPDATE sales_daily SET
+            units = units - OLD.quantity_sold,
+            revenue = revenue - OLD.total,
+            lines = lines - 1
+        WHERE day = DATE(OLD.sale_date) AND product_id = OLD.product_id;
+        DELETE FROM sales_daily
+        WHERE day = DATE(OLD.sale_date) AND product_id = OLD.product_id AND lines <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_update
+    AFTER UPDATE OF product_id, quantity_sold, total, sale_date ON sales
+    BEGIN
+        UPDATE sales_daily SET
+            units = units - OLD.quantity_sold,
+            revenue = revenue - OLD.total,
+            lines = lines - 1
+        WHERE day = DATE(OLD.sale_date) AND product_id = OLD.product_id;
+        DELETE FROM sales_daily
+        WHERE day = DATE(OLD.sale_date) AND product_id = OLD.product_id AND lines <= 0;
+        INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+        VALUES (DATE(NEW.sale_date), NEW.product_id, NEW.quantity_sold, NEW.total, 1)
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            lines = lines + 1;
+    END;
+
+    DELETE FROM sales_daily;
+    INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+    SELECT DATE(sale_date), product_id, SUM(quantity_sold), SUM(total), COUNT(*)
+    FROM sales
+    GROUP BY DATE(sale_date), product_id;
+    """,
+
+    # 4: full-text product search index, kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, sku, category, description,
+        tokenize = 'unicode61', prefix = '2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts (rowid, name, sku, category, description)
+        VALUES (NEW.id, NEW.name, NEW.sku,
+                (SELECT name FROM categories WHERE id = NEW.category_id),
+                NEW.description);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+    AFTER UPDATE OF name, sku, category_id, description ON products
+    BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+        INSERT INTO products_fts (rowid, name, sku, category, description)
+        VALUES (NEW.id, NEW.name, NEW.sku,
+                (SELECT name FROM categories WHERE id = NEW.category_id),
+                NEW.description);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete AFTER DELETE ON products
+    BEGIN
+        DELETE FROM products_fts WHERE rowid = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_category AFTER UPDATE OF name ON categories
+    BEGIN
+        UPDATE products_fts SET category = NEW.name
+        WHERE rowid IN (SELECT id FROM products WHERE category_id = NEW.id);
+    END;
+
+    DELETE FROM products_fts;
+    INSERT INTO products_fts (rowid, name, sku, category, description)
+    SELECT p.id, p.name, p.sku, c.name, p.description
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id;
+    """,
+
+    # 5: indexes backing keyset pagination
+    """
+    CREATE INDEX IF NOT EXISTS idx_products_name
+        ON products(name);
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_created
+        ON stock_movements(created_at);
+    """,
+
+    # 6: per-table change counters, bumped by triggers on every write
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        name    TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+    INSERT OR IGNORE INTO table_versions (name) VALUES
+        ('categories'), ('products'), ('sales'), ('stock_movements');
+    """ + "".join(_version_triggers(table) for table in TRACKED_TABLES),
+
+    # 7: all-time sales totals, kept in step with sales_daily by triggers
+    """
+    CREATE TABLE IF NOT EXISTS sales_totals (
+        id              INTEGER PRIMARY KEY CHECK (id = 1),
+        revenue         REAL    NOT NULL DEFAULT 0.0,
+        lines           INTEGER NOT NULL DEFAULT 0
+    );
+    """ + _SALES_TOTALS_TRIGGERS + """
+    INSERT OR REPLACE INTO sales_totals (id, revenue, lines)
+    SELECT 1, COALESCE(SUM(revenue), 0), COALESCE(SUM(lines), 0) FROM sales_daily;
+    """,
+
+    # 8: change counter for the searchable product text (see search_products)
+    """
+    INSERT OR IGNORE INTO table_versions (name) VALUES ('products_fts');
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_version_insert AFTER INSERT ON products
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'products_fts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_version_update
+    AFTER UPDATE OF name, sku, category_id, description ON products
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'products_fts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_version_delete AFTER DELETE ON products
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'products_fts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_version_category
+    AFTER UPDATE OF name ON categories
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'products_fts';
+    END;
+    """,
+    # 9: integer timestamps (see to_timestamp) with a stored sale_day, so
+    # date filters and per-day rollups are index range scans. SQLite cannot
+    # change a column's type in place, so sales, stock_movements and
+    # sales_daily are rebuilt, with their indexes and triggers.
+    """
+    CREATE TABLE sales_new (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id      INTEGER NOT NULL,
+        quantity_sold    INTEGER NOT NULL,
+        sale_price       REAL    NOT NULL,
+        total            REAL    NOT NULL,
+        sale_date        INTEGER NOT NULL,
+        sale_day         INTEGER GENERATED ALWAYS AS (sale_date / 86400) STORED,
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    );
+    INSERT INTO sales_new (id, product_id, quantity_sold, sale_price, total, sale_date)
+    SELECT id, product_id, quantity_sold, sale_price, total,
+           CAST(strftime('%s', sale_date) AS INTEGER)
+    FROM sales;
+    DROP TABLE sales;
+    ALTER TABLE sales_new RENAME TO sales;
+
+    CREATE INDEX IF NOT EXISTS idx_sales_sale_date
+        ON sales(sale_date);
+    CREATE INDEX IF NOT EXISTS idx_sales_product_date
+        ON sales(product_id, sale_date);
+    CREATE INDEX IF NOT EXISTS idx_sales_day_product
+        ON sales(sale_day, product_id);
+
+    CREATE TABLE stock_movements_new (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id      INTEGER NOT NULL,
+        movement_type   TEXT    NOT NULL,  -- 'IN' or 'OUT'
+        quantity         INTEGER NOT NULL,
+        note            TEXT,
+        created_at      INTEGER NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    );
+    INSERT INTO stock_movements_new (id, product_id, movement_type, quantity, note, created_at)
+    SELECT id, product_id, movement_type, quantity, note,
+           CAST(strftime('%s', created_at) AS INTEGER)
+    FROM stock_movements;
+    DROP TABLE stock_movements;
+    ALTER TABLE stock_movements_new RENAME TO stock_movements;
+
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_product_created
+        ON stock_movements(product_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_created
+        ON stock_movements(created_at);
+
+    DROP TABLE sales_daily;
+    CREATE TABLE sales_daily (
+        day             INTEGER NOT NULL,   -- sale_day: days since 1970-01-01
+        product_id      INTEGER NOT NULL,
+        units           INTEGER NOT NULL DEFAULT 0,
+        revenue         REAL    NOT NULL DEFAULT 0.0,
+        lines           INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID;
+    INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+    SELECT sale_day, product_id, SUM(quantity_sold), SUM(total), COUNT(*)
+    FROM sales
+    GROUP BY sale_day, product_id;
+    """ + _SALES_TOTALS_TRIGGERS + """
+    UPDATE sales_totals SET
+        revenue = (SELECT COALESCE(SUM(revenue), 0) FROM sales_daily),
+        lines = (SELECT COALESCE(SUM(lines), 0) FROM sales_daily);
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_insert AFTER INSERT ON sales
+    BEGIN
+        INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+        VALUES (NEW.sale_day, NEW.product_id, NEW.quantity_sold, NEW.total, 1)
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            lines = lines + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_delete AFTER DELETE ON sales
+    BEGIN
+        UPDATE sales_daily SET
+            units = units - OLD.quantity_sold,
+            revenue = revenue - OLD.total,
+            lines = lines - 1
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id;
+        DELETE FROM sales_daily
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id AND lines <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_daily_update
+    AFTER UPDATE OF product_id, quantity_sold, total, sale_date ON sales
+    BEGIN
+        UPDATE sales_daily SET
+            units = units - OLD.quantity_sold,
+            revenue = revenue - OLD.total,
+            lines = lines - 1
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id;
+        DELETE FROM sales_daily
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id AND lines <= 0;
+        INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+        VALUES (NEW.sale_day, NEW.product_id, NEW.quantity_sold, NEW.total, 1)
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            lines = lines + 1;
+    END;
+
+    UPDATE table_versions SET version = version + 1
+    WHERE name IN ('sales', 'stock_movements');
+    """ + _version_triggers("sales") + _version_triggers("stock_movements"),
+
+    # 10: registry of per-year archive files (see archive.py). Sales deleted
+    # from main because they are being moved into an archive keep their
+    # sales_daily rows, so the reports still cover archived years.
+    """
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        year            INTEGER PRIMARY KEY,
+        file            TEXT    NOT NULL,   -- relative to DB_PATH's folder
+        start_ts        INTEGER NOT NULL,   -- first second of the year
+        end_ts          INTEGER NOT NULL,   -- first second of the next year
+        status          TEXT    NOT NULL DEFAULT 'copying'  -- or 'done'
+    );
+    INSERT OR IGNORE INTO table_versions (name) VALUES ('archive_partitions');
+
+    DROP TRIGGER IF EXISTS trg_sales_daily_delete;
+    CREATE TRIGGER trg_sales_daily_delete AFTER DELETE ON sales
+    WHEN NOT EXISTS (SELECT 1 FROM archive_partitions
+                     WHERE OLD.sale_date >= start_ts AND OLD.sale_date < end_ts)
+    BEGIN
+        UPDATE sales_daily SET
+            units = units - OLD.quantity_sold,
+            revenue = revenue - OLD.total,
+            lines = lines - 1
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id;
+        DELETE FROM sales_daily
+        WHERE day = OLD.sale_day AND product_id = OLD.product_id AND lines <= 0;
+    END;
+    """ + _version_triggers("archive_partitions"),
+
+    # 11: index prefixes of 1 to 6 characters, so a word being typed is
+    # looked up in the index rather than by merging every matching term
+    # (see _fts_query). FTS5 options cannot be altered; rebuild the table.
+    """
+    DROP TABLE IF EXISTS products_fts;
+    CREATE VIRTUAL TABLE products_fts USING fts5(
+        name, sku, category, description,
+        tokenize = 'unicode61', prefix = '1 2 3 4 5 6'
+    );
+    INSERT INTO products_fts (rowid, name, sku, category, description)
+    SELECT p.id, p.name, p.sku, c.name, p.description
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id;
+
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products_fts';
+    """,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _run_script(conn, script):
+    """Execute a multi-statement SQL script inside the current transaction.
+
+    Unlike executescript(), this does not commit first, so a migration and
+    its version bump land atomically.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db():
+    """Bring the schema up to date, applying any pending migrations."""
+    if get_schema_version() >= SCHEMA_VERSION:
+        return
+    with transaction(immediate=True) as conn:
+        # Re-read under the write lock in case another process migrated first.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            _run_script(conn, MIGRATIONS[number - 1])
+            conn.execute(f"PRAGMA user_version = {number}")
+
+
+# --------------- Archive partitions ---------------
+
+# Sales and stock movements of closed years can be moved into one archive
+# file per year (see archive.py), listed in archive_partitions. The sales
+# and stock movement helpers attach the files whose year overlaps the
+# requested range and read them together with the hot tables in main.
+# While a year is being moved ('copying'), a row can be in both places;
+# its copy in main is the one read.
+
+# Archive files kept attached per connection; the least recently used
+# beyond this are detached. SQLite allows 10 attached databases by default.
+ARCHIVE_ATTACH_LIMIT = 8
+
+# Tables of an archive file: sales and stock_movements as in main, without
+# the foreign keys, which cannot reach across files.
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {schema}.sales (
+    id              INTEGER PRIMARY KEY,
+    product_id      INTEGER NOT NULL,
+    quantity_sold    INTEGER NOT NULL,
+    sale_price       REAL    NOT NULL,
+    total            REAL    NOT NULL,
+    sale_date        INTEGER NOT NULL,
+    sale_day         INTEGER GENERATED ALWAYS AS (sale_date / 86400) STORED
+);
+CREATE INDEX IF NOT EXISTS {schema}.idx_sales_sale_date
+    ON sales(sale_date);
+CREATE INDEX IF NOT EXISTS {schema}.idx_sales_product_date
+    ON sales(product_id, sale_date);
+
+CREATE TABLE IF NOT EXISTS {schema}.stock_movements (
+    id              INTEGER PRIMARY KEY,
+    product_id      INTEGER NOT NULL,
+    movement_type   TEXT    NOT NULL,
+    quantity         INTEGER NOT NULL,
+    note            TEXT,
+    created_at      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {schema}.idx_stock_movements_product_created
+    ON stock_movements(product_id, created_at);
+CREATE INDEX IF NOT EXISTS {schema}.idx_stock_movements_created
+    ON stock_movements(created_at);
+"""
+
+
+def archive_file(year):
+    """Return the archive file name for `year`, e.g. 'inventory-2023.db'."""
+    stem = os.path.splitext(os.path.basename(DB_PATH))[0]
+    return f"{stem}-{int(year)}.db"
+
+
+def get_archive_partitions():
+    """Return (year, file, start_ts, end_ts, status) per archived year, newest first.
+
+    Cached per thread until archive_partitions changes.
+    """
+    version = get_table_versions(("archive_partitions",))["archive_partitions"]
+    cached = _local.archives
+    if cached is None or cached[0] != version:
+        rows = get_connection().execute("""
+            SELECT year, file, start_ts, end_ts, status
+            FROM archive_partitions
+            ORDER BY year DESC
+        """).fetchall()
+        _local.archives = cached = (version, rows)
+    return cached[1]
+
+
+def attach_archive(year, file, keep=()):
+    """Attach an archive file to this thread's connection; return its schema name.
+
+    Must be called outside a transaction unless the file is already
+    attached. Detaches the least recently used file, other than the schema
+    names in `keep`, once ARCHIVE_ATTACH_LIMIT are attached.
+    """
     conn = get_connection()
-    rows = conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
-    conn.close()
+    schema = f"archive_{int(year)}"
+    attached = _local.attached
+    if schema in attached:
+        attached.move_to_end(schema)
+        return schema
+    for old in list(attached):
+        if len(attached) < ARCHIVE_ATTACH_LIMIT:
+            break
+        if old not in keep:
+            conn.execute(f"DETACH DATABASE {old}")
+            del attached[old]
+    path = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), file)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    attached[schema] = file
+    return schema
+
+
+def _archives(first=None, last=None):
+    """Yield the archives overlapping [first, last] as batches of [(schema, done)].
+
+    Without bounds, every archive. Newest first. A batch holds at most
+    ARCHIVE_ATTACH_LIMIT archives and is attached as it is yielded, which
+    may detach the previous batch, so finish with one before the next.
+    """
+    partitions = [(year, file, status)
+                  for year, file, start_ts, end_ts, status in get_archive_partitions()
+                  if (first is None or end_ts > first) and (last is None or start_ts <= last)]
+    for start in range(0, len(partitions), ARCHIVE_ATTACH_LIMIT):
+        batch = partitions[start:start + ARCHIVE_ATTACH_LIMIT]
+        keep = {f"archive_{year}" for year, _, _ in batch}
+        yield [(attach_archive(year, file, keep), status == "done")
+               for year, file, status in batch]
+
+
+def _partitioned(table, alias, select, conditions, params, first=None, last=None,
+                 order_by=None, limit=None):
+    """Yield (sql, params) running `select` over main and the overlapping archives.
+
+    `select` is a SELECT ... FROM {schema}.<table> <alias> ...; one copy
+    per partition, each filtered by `conditions`, is joined with UNION ALL.
+    In an archive still being filled, rows also found in main are skipped.
+    With `order_by`, each copy returns only its first `limit` rows, so a
+    page is an index seek per partition rather than a sort of them all.
+
+    SQLite attaches at most 10 files, so there is one (sql, params) per
+    batch of _archives(), main in the first; run each before taking the
+    next, and combine the results (see _merge).
+    """
+    batches = _archives(first, last)
+    schemas = [("main", True)] + next(batches, [])
+    while schemas:
+        branches = []
+        all_params = []
+        for schema, done in schemas:
+            where = list(conditions)
+            if not done:
+                where.append(
+                    f"NOT EXISTS (SELECT 1 FROM main.{table} h WHERE h.id = {alias}.id)")
+            branch = select.format(schema=schema)
+            if where:
+                branch += " WHERE " + " AND ".join(where)
+            all_params += params
+            if order_by is not None:
+                branch = f"SELECT * FROM ({branch} ORDER BY {order_by} LIMIT ?)"
+                all_params.append(limit)
+            branches.append(branch)
+        yield "\nUNION ALL\n".join(branches), all_params
+        schemas = next(batches, [])
+
+
+def _fetch(query, partitions, extra_params=()):
+    """Run `query`, reading FROM ({sources}), per _partitioned() batch; return the row lists."""
+    conn = get_connection()
+    return [conn.execute(query.format(sources=sources), params + list(extra_params)).fetchall()
+            for sources, params in partitions]
+
+
+def _merge(results, key, reverse=False, limit=None):
+    """Merge the row lists of _fetch(), each sorted by `key`, into one.
+
+    A row whose id (first column) already came from an earlier batch is
+    dropped: it was archived between the two reads.
+    """
+    if len(results) == 1:
+        return results[0]
+    rows = []
+    seen = set()
+    for row in heapq.merge(*results, key=key, reverse=reverse):
+        if row[0] not in seen:
+            seen.add(row[0])
+            rows.append(row)
+            if len(rows) == limit:
+                break
     return rows
 
 
+# --------------- Category helpers ---------------
+
+def get_categories():
+    return get_connection().execute(
+        "SELECT id, name FROM categories ORDER BY name").fetchall()
+
+
 def add_category(name: str):
-    conn = get_connection()
-    conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-    conn.commit()
-    conn.close()
+    with _catalog_write() as (conn, _):
+        conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
+
+
+# --------------- Product catalog cache ---------------
+
+PRODUCT_COLUMNS = """
+    SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
+           p.quantity, p.low_stock_threshold, p.description,
+           p.created_at, p.updated_at, p.category_id
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+"""
+
+
+def _catalog_versions(conn):
+    """Read the products/categories change counters directly (not cached)."""
+    versions = dict(conn.execute(
+        "SELECT name, version FROM table_versions"
+        " WHERE name IN ('products', 'categories')").fetchall())
+    return versions.get("products", 0), versions.get("categories", 0)
+
+
+class _Catalog:
+    """Process-wide copy of every product row, indexed by id and by SKU.
+
+    Rows have the get_all_products() layout. The copy is tagged with the
+    database file and the products/categories versions it reflects: a
+    reader that finds another DB_PATH or the database at other versions
+    (another process wrote) reloads it, and
+    this process's own writes patch the changed rows in after they commit
+    (see _catalog_write). Reads inside a transaction see committed data.
+
+    `ordered` holds the rows in (name, id) order with their sort keys. It
+    is replaced rather than reshuffled, so a reader on another thread can
+    keep paging through the pair it got.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.versions = None
+        self.by_id = {}
+        self.by_sku = {}
+        self.ordered = ([], [])     # (rows, (name, id) keys)
+        self.totals = (0, 0, 0)     # (product_count, units_on_hand, low_stock_count)
+
+    def current(self):
+        """Return the catalog, reloading it if the database has moved on."""
+        versions = get_table_versions(("products", "categories"))
+        if (_local.path != self.path
+                or (versions["products"], versions["categories"]) != self.versions):
+            if _local.depth:
+                # Mid-transaction the rows may include uncommitted writes;
+                # serve this caller without caching them.
+                snapshot = _Catalog()
+                snapshot._load()
+                return snapshot
+            with self.lock:
+                self._load()
+        return self
+
+    def _load(self):
+        with transaction() as conn:
+            # Versions first: rows read after them are at least as new.
+            versions = _catalog_versions(conn)
+            if _local.path == self.path and versions == self.versions:
+                return
+            rows = conn.execute(PRODUCT_COLUMNS + " ORDER BY p.name, p.id").fetchall()
+        self.by_id = {row[0]: row for row in rows}
+        self.by_sku = {row[2]: row for row in rows}
+        self.ordered = (rows, [(row[1], row[0]) for row in rows])
+        self.totals = (len(rows), sum(row[6] for row in rows),
+                       sum(row[6] <= row[7] for row in rows))
+        self.path = _local.path
+        self.versions = versions
+
+    def patch(self, path, before, after, product_ids, rows):
+        """Apply a committed write to `path` that moved the versions from `before` to `after`.
+
+        `rows` maps the re-read rows of `product_ids`; ids missing from it
+        were deleted. If the catalog was not at `before`, some other write
+        was missed, so it is dropped and reloaded on next use. Writes to
+        another database than the cached one are left to that reload.
+        """
+        with self.lock:
+            self._patch(path, before, after, product_ids, rows)
+
+    def _patch(self, path, before, after, product_ids, rows):
+        if path != self.path:
+            return
+        if self.versions is not None and all(
+                have >= want for have, want in zip(self.versions, after)):
+            # A reader reloaded after the commit; the write is already in.
+            return
+        if self.versions != before:
+            self.versions = None
+            return
+        ordered_rows, keys = self.ordered
+        # Stock and price changes keep a row's place; swap those in place.
+        moved = []
+        for product_id in product_ids:
+            old, row = self.by_id.get(product_id), rows.get(product_id)
+            if old is not None and row is not None and old[1] == row[1]:
+                ordered_rows[bisect.bisect_left(keys, (old[1], old[0]))] = row
+                self._index(old, row)
+            else:
+                moved.append((old, row))
+        if moved:
+            ordered_rows, keys = list(ordered_rows), list(keys)
+            for old, row in moved:
+                if old is not None:
+                    i = bisect.bisect_left(keys, (old[1], old[0]))
+                    del ordered_rows[i], keys[i]
+                if row is not None:
+                    i = bisect.bisect_left(keys, (row[1], row[0]))
+                    ordered_rows.insert(i, row)
+                    keys.insert(i, (row[1], row[0]))
+                self._index(old, row)
+            self.ordered = (ordered_rows, keys)
+        self.versions = after
+
+    def _index(self, old, row):
+        count, units, low = self.totals
+        if old is not None:
+            del self.by_id[old[0]]
+            self.by_sku.pop(old[2], None)
+            count, units, low = count - 1, units - old[6], low - (old[6] <= old[7])
+        if row is not None:
+            self.by_id[row[0]] = row
+            self.by_sku[row[2]] = row
+            count, units, low = count + 1, units + row[6], low + (row[6] <= row[7])
+        self.totals = (count, units, low)
+
+
+_catalog = _Catalog()
+
+
+@contextmanager
+def _catalog_write():
+    """Write transaction whose product changes are patched into the catalog.
+
+    Yields (conn, changed); add the id of every product inserted, updated
+    or deleted to `changed`. The write lock is taken up front so the
+    versions read at the start and end bracket exactly this write.
+
+    A top-level write holds the catalog lock across its COMMIT, so a reader
+    on another thread that already sees the new versions waits for the
+    patch instead of reloading every product.
+    """
+    top_level = not getattr(_local, "depth", 0)
+    locked = False
+    try:
+        with transaction(immediate=True) as conn:
+            path = _local.path
+            before = _catalog_versions(conn)
+            changed = set()
+            yield conn, changed
+            after = _catalog_versions(conn)
+            rows = {}
+            ids = list(changed)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update((row[0], row) for row in conn.execute(
+                    PRODUCT_COLUMNS + f" WHERE p.id IN ({placeholders})", chunk))
+            if top_level:
+                locked = _catalog.lock.acquire()
+            else:
+                _local.after_commit.append(
+                    lambda: _catalog.patch(path, before, after, ids, rows))
+        if locked:
+            _catalog._patch(path, before, after, ids, rows)
+    finally:
+        if locked:
+            _catalog.lock.release()
+
+
+def get_catalog():
+    """Return every product in name order, from the shared catalog cache.
+
+    The list is shared: do not modify it.
+    """
+    return _catalog.current().ordered[0]
+
+
+def get_product_by_sku(sku):
+    return _catalog.current().by_sku.get(sku)
 
 
 # --------------- Product CRUD ---------------
@@ -98,217 +1052,630 @@ def add_category(name: str):
 def add_product(name, sku, category_id, price, cost_price, quantity,
                 low_stock_threshold, description=""):
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO products
-            (name, sku, category_id, price, cost_price, quantity,
-             low_stock_threshold, description, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (name, sku, category_id, price, cost_price, quantity,
-          low_stock_threshold, description, now, now))
-    conn.commit()
-    conn.close()
+    with _catalog_write() as (conn, changed):
+        cursor = conn.execute("""
+            INSERT INTO products
+                (name, sku, category_id, price, cost_price, quantity,
+                 low_stock_threshold, description, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (name, sku, category_id, price, cost_price, quantity,
+              low_stock_threshold, description, now, now))
+        changed.add(cursor.lastrowid)
 
 
 def update_product(product_id, name, sku, category_id, price, cost_price,
                    quantity, low_stock_threshold, description=""):
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = get_connection()
-    conn.execute("""
-        UPDATE products SET
-            name=?, sku=?, category_id=?, price=?, cost_price=?,
-            quantity=?, low_stock_threshold=?, description=?, updated_at=?
-        WHERE id=?
-    """, (name, sku, category_id, price, cost_price, quantity,
-          low_stock_threshold, description, now, product_id))
-    conn.commit()
-    conn.close()
+    with _catalog_write() as (conn, changed):
+        changed.add(product_id)
+        conn.execute("""
+            UPDATE products SET
+                name=?, sku=?, category_id=?, price=?, cost_price=?,
+                quantity=?, low_stock_threshold=?, description=?, updated_at=?
+            WHERE id=?
+        """, (name, sku, category_id, price, cost_price, quantity,
+              low_stock_threshold, description, now, product_id))
 
 
 def delete_product(product_id):
-    conn = get_connection()
-    conn.execute("DELETE FROM sales WHERE product_id=?", (product_id,))
-    conn.execute("DELETE FROM stock_movements WHERE product_id=?", (product_id,))
-    conn.execute("DELETE FROM products WHERE id=?", (product_id,))
-    conn.commit()
-    conn.close()
+    batches = _archives()
+    archives = next(batches, [])    # attach outside the transaction
+    with _catalog_write() as (conn, changed):
+        changed.add(product_id)
+        conn.execute("DELETE FROM sales WHERE product_id=?", (product_id,))
+        conn.execute("DELETE FROM stock_movements WHERE product_id=?", (product_id,))
+        # What is left in the rollup are the product's archived sales.
+        conn.execute("DELETE FROM sales_daily WHERE product_id=?", (product_id,))
+        conn.execute("DELETE FROM products WHERE id=?", (product_id,))
+        _delete_archived(conn, archives, product_id)
+    # Archives past the first batch cannot be attached inside that
+    # transaction; each further batch is cleared in one of its own.
+    for archives in batches:
+        with transaction(immediate=True) as conn:
+            _delete_archived(conn, archives, product_id)
+
+
+def _delete_archived(conn, archives, product_id):
+    for schema, _ in archives:
+        conn.execute(f"DELETE FROM {schema}.sales WHERE product_id=?", (product_id,))
+        conn.execute(f"DELETE FROM {schema}.stock_movements WHERE product_id=?",
+                     (product_id,))
+
+
+def _iter_pages(fetch_page, page_size):
+    """Yield rows from `fetch_page(after)` until a short page comes back."""
+    after = None
+    while True:
+        rows = fetch_page(after)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = rows[-1]
+
+
+def _limit_clause(params, limit, offset):
+    """Return a LIMIT/OFFSET clause (and extend params) when limit is given."""
+    if limit is None:
+        return ""
+    params.extend([limit, offset])
+    return " LIMIT ? OFFSET ?"
 
 
 def get_all_products():
-    conn = get_connection()
-    rows = conn.execute("""
-        SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
-               p.quantity, p.low_stock_threshold, p.description,
-               p.created_at, p.updated_at, p.category_id
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        ORDER BY p.name
-    """).fetchall()
-    conn.close()
-    return rows
+    return list(get_catalog())
 
 
-def search_products(keyword):
-    conn = get_connection()
-    like = f"%{keyword}%"
-    rows = conn.execute("""
-        SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
-               p.quantity, p.low_stock_threshold, p.description,
-               p.created_at, p.updated_at, p.category_id
-        FROM products p
+def get_products_page(after=None, limit=PAGE_SIZE):
+    """Return the next page of get_all_products() rows.
+
+    `after` is the last row of the previous page (or None for the first
+    page); paging is keyed on (name, id), so each page is a bisect into
+    the catalog cache.
+    """
+    rows, keys = _catalog.current().ordered
+    start = 0 if after is None else bisect.bisect_right(keys, (after[1], after[0]))
+    return rows[start:start + limit]
+
+
+def iter_products(chunk_size=PAGE_SIZE):
+    """Yield every product in name order, one page in memory at a time."""
+    return _iter_pages(lambda after: get_products_page(after, chunk_size), chunk_size)
+
+
+# Full-text matches ranked per search. Matches come off the index in id
+# order, so a query with more matches than this ranks only the first
+# SEARCH_CANDIDATES of them: search cost stays flat however broad the query
+# or large the catalog, at the price of recall for broad queries.
+SEARCH_CANDIDATES = 500
+
+# Longest prefix in the products_fts prefix index (see migration 11).
+SEARCH_PREFIX_CHARS = 6
+
+# Rankings kept for the most recent distinct searches.
+SEARCH_CACHE_SIZE = 256
+_search_cache = OrderedDict()   # (DB_PATH, match, candidates) -> (products_fts version, ids)
+_search_lock = threading.Lock()
+
+# Score of a match: 10 per name or SKU hit, 2 for category, 1 for description.
+# Unlike bm25, it reads only the candidate's own positions, not statistics
+# over every row containing the terms, so it stays cheap for common words.
+_SEARCH_SCORE = " + ".join(
+    f"{weight} * (instr(highlight(products_fts, {column}, char(1), ''), char(1)) > 0)"
+    for column, weight in enumerate((10, 10, 2, 1)))
+
+
+def _fts_query(keyword):
+    """Turn free text into an FTS5 query that requires every word.
+
+    The last word is matched as a prefix while it is still being typed,
+    cut to SEARCH_PREFIX_CHARS so the prefix index answers it; a longer
+    word being typed also matches words that only share its first
+    SEARCH_PREFIX_CHARS characters.
+    """
+    words = re.findall(r"\w+", keyword)
+    typing = bool(words) and not keyword[-1].isspace()
+    if typing:
+        words[-1] = words[-1][:SEARCH_PREFIX_CHARS]
+    terms = [f'"{word}"' for word in words]
+    if typing:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_products(keyword, limit=None, offset=0, candidates=SEARCH_CANDIDATES):
+    """Full-text search over name, SKU, category and description.
+
+    Results are ranked with name and SKU hits first, then category, then
+    description hits, and by name within a rank. Only the first
+    `candidates` matches are ranked (see SEARCH_CANDIDATES): a broad query
+    can miss a better match further down the index, so callers should
+    expect the user to narrow the search rather than scroll for it.
+
+    The ranking of recent searches is cached until the searchable text
+    changes (the products_fts counter), and `limit`/`offset` page through
+    it; the rows themselves come from the catalog, so stock and price
+    changes show up without re-ranking.
+    """
+    match = _fts_query(keyword)
+    if not match:
+        return []
+    query = f"""
+        FROM (SELECT rowid, {_SEARCH_SCORE} as score
+              FROM products_fts
+              WHERE products_fts MATCH ?
+              LIMIT ?) f
+        JOIN products p ON p.id = f.rowid
         LEFT JOIN categories c ON p.category_id = c.id
-        WHERE p.name LIKE ? OR p.sku LIKE ? OR c.name LIKE ?
-        ORDER BY p.name
-    """, (like, like, like)).fetchall()
-    conn.close()
-    return rows
+        ORDER BY f.score DESC, p.name, p.id
+    """
+    params = [match, candidates]
+    conn = get_connection()
+    if _local.depth:
+        # Include this transaction's own uncommitted changes.
+        return conn.execute("""
+            SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
+                   p.quantity, p.low_stock_threshold, p.description,
+                   p.created_at, p.updated_at, p.category_id
+        """ + query + _limit_clause(params, limit, offset), params).fetchall()
+
+    key = (_local.path, match, candidates)
+    version = get_table_versions(("products_fts",))["products_fts"]
+    with _search_lock:
+        cached = _search_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _search_cache.move_to_end(key)
+    if cached is not None and cached[0] == version:
+        ids = cached[1]
+    else:
+        ids = [row[0] for row in conn.execute("SELECT p.id " + query, params)]
+        with _search_lock:
+            _search_cache[key] = (version, ids)
+            if len(_search_cache) > SEARCH_CACHE_SIZE:
+                _search_cache.popitem(last=False)
+    if limit is not None:
+        ids = ids[offset:offset + limit]
+    by_id = _catalog.current().by_id
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
 
 
 def get_low_stock_products():
-    conn = get_connection()
-    rows = conn.execute("""
-        SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
-               p.quantity, p.low_stock_threshold
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        WHERE p.quantity <= p.low_stock_threshold
-        ORDER BY p.quantity ASC
-    """).fetchall()
-    conn.close()
-    return rows
+    low = [row[:8] for row in get_catalog() if row[6] <= row[7]]
+    low.sort(key=lambda row: row[6])
+    return low
 
 
 def get_product_by_id(product_id):
-    conn = get_connection()
-    row = conn.execute("""
-        SELECT p.id, p.name, p.sku, c.name, p.price, p.cost_price,
-               p.quantity, p.low_stock_threshold, p.description,
-               p.created_at, p.updated_at, p.category_id
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        WHERE p.id=?
-    """, (product_id,)).fetchone()
-    conn.close()
-    return row
+    return _catalog.current().by_id.get(product_id)
 
 
 # --------------- Stock movements ---------------
 
+def _retry_when_busy(write):
+    """Call write(), starting over with backoff while the database is locked.
+
+    Only a whole transaction can be retried, so inside an enclosing
+    transaction the error is passed straight up.
+    """
+    delay = 0.05
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return write()
+        except sqlite3.OperationalError as e:
+            busy = "locked" in str(e) or "busy" in str(e)
+            if not busy or _local.depth or attempt == BUSY_RETRIES:
+                raise
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
+
+
+def _take_stock(conn, product_id, quantity, now):
+    """Decrement stock only if enough is left; raise InsufficientStockError if not.
+
+    The check and the decrement are one statement, so two checkouts of the
+    last units cannot both succeed.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+    updated = conn.execute("""
+        UPDATE products SET quantity = quantity - ?, updated_at = ?
+        WHERE id = ? AND quantity >= ?
+    """, (quantity, now, product_id, quantity)).rowcount
+    if not updated:
+        row = conn.execute("SELECT quantity FROM products WHERE id = ?",
+                           (product_id,)).fetchone()
+        if row is None:
+            raise UnknownProductError(product_id)
+        raise InsufficientStockError(product_id, quantity, row[0])
+
+
 def add_stock_in(product_id, quantity, note=""):
+    """Add `quantity` units to stock; raises UnknownProductError for a missing product."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
-        VALUES (?, 'IN', ?, ?, ?)
-    """, (product_id, quantity, note, now))
-    conn.execute("UPDATE products SET quantity = quantity + ?, updated_at=? WHERE id=?",
-                 (quantity, now, product_id))
-    conn.commit()
-    conn.close()
+    with _catalog_write() as (conn, changed):
+        changed.add(product_id)
+        if not conn.execute("UPDATE products SET quantity = quantity + ?, updated_at=? WHERE id=?",
+                            (quantity, now, product_id)).rowcount:
+            raise UnknownProductError(product_id)
+        conn.execute("""
+            INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
+            VALUES (?, 'IN', ?, ?, ?)
+        """, (product_id, quantity, note, to_timestamp(now)))
 
 
 def add_stock_out(product_id, quantity, note=""):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
-        VALUES (?, 'OUT', ?, ?, ?)
-    """, (product_id, quantity, note, now))
-    conn.execute("UPDATE products SET quantity = quantity - ?, updated_at=? WHERE id=?",
-                 (quantity, now, product_id))
-    conn.commit()
-    conn.close()
+    """Take `quantity` units out of stock.
+
+    Raises InsufficientStockError, and records nothing, if fewer units are
+    in stock at the moment of the write.
+    """
+    def write():
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with _catalog_write() as (conn, changed):
+            changed.add(product_id)
+            _take_stock(conn, product_id, quantity, now)
+            conn.execute("""
+                INSERT INTO stock_movements (product_id, movement_type, quantity, note, created_at)
+                VALUES (?, 'OUT', ?, ?, ?)
+            """, (product_id, quantity, note, to_timestamp(now)))
+    _retry_when_busy(write)
 
 
 # --------------- Sales ---------------
 
 def record_sale(product_id, quantity_sold, sale_price):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    """Record a sale and take the units out of stock.
+
+    Raises InsufficientStockError, and records nothing, if fewer units are
+    in stock at the moment of the write (e.g. another till sold them since
+    the dialog opened).
+    """
     total = quantity_sold * sale_price
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO sales (product_id, quantity_sold, sale_price, total, sale_date)
-        VALUES (?, ?, ?, ?, ?)
-    """, (product_id, quantity_sold, sale_price, total, now))
-    conn.execute("UPDATE products SET quantity = quantity - ?, updated_at=? WHERE id=?",
-                 (quantity_sold, now, product_id))
-    conn.commit()
-    conn.close()
+
+    def write():
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with _catalog_write() as (conn, changed):
+            changed.add(product_id)
+            _take_stock(conn, product_id, quantity_sold, now)
+            conn.execute("""
+                INSERT INTO sales (product_id, quantity_sold, sale_price, total, sale_date)
+                VALUES (?, ?, ?, ?, ?)
+            """, (product_id, quantity_sold, sale_price, total, to_timestamp(now)))
+    _retry_when_busy(write)
+
+
+def record_sales_batch(lines):
+    """Record many sales in a single transaction.
+
+    `lines` is an iterable of (product_id, quantity_sold, sale_price). Stock
+    is validated for the whole batch: lines are accepted in order while the
+    product still has enough units, and rejected lines are not written.
+    Stock is decremented with one UPDATE per product.
+
+    Returns one (ok, error) tuple per input line, in input order.
+    """
+    lines = list(lines)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = to_timestamp(now)
+    results = []
+    rows = []
+    decrements = {}
+
+    with _catalog_write() as (conn, changed):
+        product_ids = list({line[0] for line in lines})
+        stock = {}
+        for i in range(0, len(product_ids), 500):
+            chunk = product_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            stock.update(conn.execute(
+                f"SELECT id, quantity FROM products WHERE id IN ({placeholders})",
+                chunk))
+
+        for product_id, quantity_sold, sale_price in lines:
+            available = stock.get(product_id)
+            if quantity_sold <= 0:
+                results.append((False, "Quantity must be positive"))
+            elif available is None:
+                results.append((False, f"Unknown product id {product_id}"))
+            elif quantity_sold > available:
+                results.append((False, f"Only {available} units available"))
+            else:
+                stock[product_id] = available - quantity_sold
+                decrements[product_id] = decrements.get(product_id, 0) + quantity_sold
+                rows.append((product_id, quantity_sold, sale_price,
+                             quantity_sold * sale_price, timestamp))
+                results.append((True, None))
+
+        conn.executemany("""
+            INSERT INTO sales (product_id, quantity_sold, sale_price, total, sale_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany(
+            "UPDATE products SET quantity = quantity - ?, updated_at=? WHERE id=?",
+            [(qty, now, pid) for pid, qty in decrements.items()])
+        changed.update(decrements)
+    return results
+
+
+# One branch of a partitioned sales query (see _partitioned); the outer
+# query formats sale_date.
+_SALES_SELECT = """
+    SELECT s.id, p.name, s.quantity_sold, s.sale_price, s.total, s.sale_date
+    FROM {schema}.sales s
+    JOIN main.products p ON s.product_id = p.id
+"""
+
+
+def _sales_range(start_date, end_date):
+    """Return the sale_date bounds for a get_sales() range, or (None, None)."""
+    if start_date and end_date:
+        return to_timestamp(start_date), to_timestamp(end_date)
+    return None, None
 
 
 def get_sales(start_date=None, end_date=None):
-    conn = get_connection()
+    first, last = _sales_range(start_date, end_date)
+    conditions = []
+    params = []
+    if first is not None:
+        conditions.append("s.sale_date BETWEEN ? AND ?")
+        params = [first, last]
+    partitions = _partitioned("sales", "s", _SALES_SELECT, conditions, params, first, last)
     query = """
-        SELECT s.id, p.name, s.quantity_sold, s.sale_price,
-               s.total, s.sale_date
-        FROM sales s
-        JOIN products p ON s.product_id = p.id
+        SELECT id, name, quantity_sold, sale_price, total,
+               datetime(sale_date, 'unixepoch')
+        FROM ({sources})
+        ORDER BY sale_date DESC, id DESC
+    """
+    return _merge(_fetch(query, partitions), itemgetter(5, 0), reverse=True)
+
+
+def get_sales_page(start_date=None, end_date=None, after=None, limit=PAGE_SIZE):
+    """Return the next page of get_sales() rows, newest first.
+
+    `after` is the last row of the previous page (or None for the first
+    page); paging is keyed on (sale_date, id), so each page is an index
+    seek in each partition read. Archived years that are entirely newer
+    than `after` or outside the range are not read.
     """
+    first, last = _sales_range(start_date, end_date)
+    conditions = []
     params = []
-    if start_date and end_date:
-        query += " WHERE s.sale_date BETWEEN ? AND ?"
-        params = [start_date, end_date]
-    query += " ORDER BY s.sale_date DESC"
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
-    return rows
+    if first is not None:
+        conditions.append("s.sale_date BETWEEN ? AND ?")
+        params += [first, last]
+    if after is not None:
+        after_ts = to_timestamp(after[5])
+        conditions.append("(s.sale_date, s.id) < (?, ?)")
+        params += [after_ts, after[0]]
+        last = after_ts if last is None else min(last, after_ts)
+    partitions = _partitioned("sales", "s", _SALES_SELECT, conditions, params,
+                              first, last, "s.sale_date DESC, s.id DESC", limit)
+    query = """
+        SELECT id, name, quantity_sold, sale_price, total,
+               datetime(sale_date, 'unixepoch')
+        FROM ({sources})
+        ORDER BY sale_date DESC, id DESC
+        LIMIT ?
+    """
+    return _merge(_fetch(query, partitions, [limit]), itemgetter(5, 0),
+                  reverse=True, limit=limit)
+
+
+def iter_sales(start_date=None, end_date=None, chunk_size=PAGE_SIZE):
+    """Yield get_sales() rows newest first, one page in memory at a time."""
+    return _iter_pages(
+        lambda after: get_sales_page(start_date, end_date, after, chunk_size), chunk_size)
+
+
+def get_sales_totals(start_date=None, end_date=None):
+    """Return (sale_count, units, revenue) over the same rows as get_sales().
+
+    Without a range this reads the sales_daily rollup, which also covers
+    archived years.
+    """
+    first, last = _sales_range(start_date, end_date)
+    if first is None:
+        return get_connection().execute("""
+            SELECT COALESCE(SUM(lines), 0), COALESCE(SUM(units), 0), COALESCE(SUM(revenue), 0)
+            FROM sales_daily
+        """).fetchone()
+    partitions = _partitioned(
+        "sales", "s",
+        "SELECT COUNT(*) AS n, COALESCE(SUM(s.quantity_sold), 0) AS units,"
+        " COALESCE(SUM(s.total), 0) AS revenue FROM {schema}.sales s",
+        ["s.sale_date BETWEEN ? AND ?"], [first, last], first, last)
+    totals = _fetch("SELECT SUM(n), SUM(units), SUM(revenue) FROM ({sources})", partitions)
+    return tuple(sum(column) for column in zip(*(rows[0] for rows in totals)))
+
+
+def get_sales_since(after_id=0, limit=PAGE_SIZE):
+    """Return (sale_count, rows) for loading sales incrementally (see analytics.py).
+
+    `rows` are up to `limit` (id, product_id, sale_day, quantity_sold,
+    total) of the sales with id > after_id, archives included, in id
+    order. `sale_count` is the number of sales in all, from the same
+    snapshot: once the rows run out, everything up to the last id read
+    has been seen, and a different count means rows were deleted.
+    """
+    partitions = _partitioned(
+        "sales", "s",
+        "SELECT s.id, s.product_id, s.sale_day, s.quantity_sold, s.total FROM {schema}.sales s",
+        ["s.id > ?"], [after_id], order_by="s.id", limit=limit)
+    query = "SELECT * FROM ({sources}) ORDER BY id LIMIT ?"
+    # The count and main's rows come from one snapshot. Archives past the
+    # first batch are read after it; a row archived in between comes back
+    # from both reads, and _merge() keeps one.
+    first_batch = next(partitions)
+    with transaction() as conn:
+        results = _fetch(query, [first_batch], [limit])
+        count = conn.execute("SELECT lines FROM sales_totals").fetchone()[0]
+    results += _fetch(query, partitions, [limit])
+    return count, _merge(results, itemgetter(0), limit=limit)
 
 
 def get_sales_summary():
-    """Return daily totals for the last 30 days."""
-    conn = get_connection()
-    rows = conn.execute("""
-        SELECT DATE(sale_date) as day, SUM(total) as revenue,
-               SUM(quantity_sold) as units
-        FROM sales
-        WHERE sale_date >= DATE('now', '-30 days')
-        GROUP BY DATE(sale_date)
+    """Return daily totals for the last 30 days, as ('YYYY-MM-DD', revenue, units)."""
+    first_day = to_timestamp(datetime.now().date() - timedelta(days=30)) // DAY
+    return get_connection().execute("""
+        SELECT date(day * 86400, 'unixepoch'), SUM(revenue) as revenue, SUM(units) as units
+        FROM sales_daily
+        WHERE day >= ?
+        GROUP BY day
         ORDER BY day
-    """).fetchall()
-    conn.close()
-    return rows
+    """, (first_day,)).fetchall()
 
 
 def get_top_products(limit=10):
-    conn = get_connection()
-    rows = conn.execute("""
-        SELECT p.name, SUM(s.quantity_sold) as total_sold, SUM(s.total) as revenue
-        FROM sales s
-        JOIN products p ON s.product_id = p.id
+    return get_connection().execute("""
+        SELECT p.name, SUM(d.units) as total_sold, SUM(d.revenue) as revenue
+        FROM sales_daily d
+        JOIN products p ON d.product_id = p.id
         GROUP BY p.name
         ORDER BY revenue DESC
         LIMIT ?
     """, (limit,)).fetchall()
-    conn.close()
-    return rows
 
 
 def get_category_sales():
-    conn = get_connection()
-    rows = conn.execute("""
-        SELECT c.name, SUM(s.total) as revenue
-        FROM sales s
-        JOIN products p ON s.product_id = p.id
+    return get_connection().execute("""
+        SELECT c.name, SUM(d.revenue) as revenue
+        FROM sales_daily d
+        JOIN products p ON d.product_id = p.id
         LEFT JOIN categories c ON p.category_id = c.id
         GROUP BY c.name
         ORDER BY revenue DESC
     """).fetchall()
-    conn.close()
-    return rows
+
+
+def get_product_profit(limit=10):
+    """Return (name, revenue, cost, profit) for the most profitable products.
+
+    Cost uses each product's current cost price.
+    """
+    return get_connection().execute("""
+        SELECT p.name,
+               SUM(d.revenue) as revenue,
+               SUM(d.units * p.cost_price) as cost,
+               SUM(d.revenue) - SUM(d.units * p.cost_price) as profit
+        FROM sales_daily d
+        JOIN products p ON d.product_id = p.id
+        GROUP BY p.name
+        ORDER BY profit DESC
+        LIMIT ?
+    """, (limit,)).fetchall()
+
+
+def get_dashboard_kpis():
+    """Return the dashboard headline figures.
+
+    The stock figures come from the catalog cache and the sales figures
+    from the sales_totals and sales_daily rollups, so this reads no more
+    than a handful of rows however large the shop gets.
+
+    (product_count, units_on_hand, low_stock_count, total_revenue,
+     today_revenue, total_sales)
+    """
+    today = to_timestamp() // DAY
+    stock = _catalog.current().totals
+    return stock + get_connection().execute("""
+        SELECT t.revenue,
+               (SELECT COALESCE(SUM(revenue), 0) FROM sales_daily WHERE day = ?),
+               t.lines
+        FROM sales_totals t
+    """, (today,)).fetchone()
+
+
+def rebuild_sales_daily():
+    """Recompute the sales_daily rollup from scratch from sales, archives included."""
+    partitions = _partitioned(
+        "sales", "s",
+        "SELECT s.sale_day, s.product_id, s.quantity_sold, s.total FROM {schema}.sales s",
+        [], [])
+    insert = """
+        INSERT INTO sales_daily (day, product_id, units, revenue, lines)
+        SELECT sale_day, product_id, SUM(quantity_sold), SUM(total), COUNT(*)
+        FROM ({sources})
+        WHERE true
+        GROUP BY sale_day, product_id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            lines = lines + excluded.lines
+    """
+    sources, params = next(partitions)
+    with transaction(immediate=True) as conn:
+        conn.execute("DELETE FROM sales_daily")
+        conn.execute(insert.format(sources=sources), params)
+    # Archives past the first batch cannot be attached inside that
+    # transaction; each further batch is added in one of its own.
+    for sources, params in partitions:
+        with transaction(immediate=True) as conn:
+            conn.execute(insert.format(sources=sources), params)
+
+
+# One branch of a partitioned stock movement query (see _partitioned).
+_MOVEMENTS_SELECT = """
+    SELECT sm.id, p.name, sm.movement_type, sm.quantity, sm.note, sm.created_at
+    FROM {schema}.stock_movements sm
+    JOIN main.products p ON sm.product_id = p.id
+"""
 
 
 def get_stock_movements(product_id=None):
-    conn = get_connection()
+    conditions = []
+    params = []
+    if product_id:
+        conditions.append("sm.product_id = ?")
+        params = [product_id]
+    partitions = _partitioned("stock_movements", "sm", _MOVEMENTS_SELECT, conditions, params)
     query = """
-        SELECT sm.id, p.name, sm.movement_type, sm.quantity, sm.note, sm.created_at
-        FROM stock_movements sm
-        JOIN products p ON sm.product_id = p.id
+        SELECT id, name, movement_type, quantity, note,
+               datetime(created_at, 'unixepoch')
+        FROM ({sources})
+        ORDER BY created_at DESC, id DESC
+    """
+    return _merge(_fetch(query, partitions), itemgetter(5, 0), reverse=True)
+
+
+def count_stock_movements():
+    partitions = _partitioned(
+        "stock_movements", "sm", "SELECT COUNT(*) AS n FROM {schema}.stock_movements sm",
+        [], [])
+    return sum(rows[0][0] for rows in _fetch("SELECT SUM(n) FROM ({sources})", partitions))
+
+
+def get_stock_movements_page(product_id=None, after=None, limit=PAGE_SIZE):
+    """Return the next page of get_stock_movements() rows, newest first.
+
+    `after` is the last row of the previous page (or None for the first
+    page); paging is keyed on (created_at, id). Archived years entirely
+    newer than `after` are not read.
     """
+    conditions = []
     params = []
+    last = None
     if product_id:
-        query += " WHERE sm.product_id = ?"
-        params = [product_id]
-    query += " ORDER BY sm.created_at DESC"
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
-    return rows
+        conditions.append("sm.product_id = ?")
+        params.append(product_id)
+    if after is not None:
+        last = to_timestamp(after[5])
+        conditions.append("(sm.created_at, sm.id) < (?, ?)")
+        params += [last, after[0]]
+    partitions = _partitioned("stock_movements", "sm", _MOVEMENTS_SELECT,
+                              conditions, params, last=last,
+                              order_by="sm.created_at DESC, sm.id DESC", limit=limit)
+    query = """
+        SELECT id, name, movement_type, quantity, note,
+               datetime(created_at, 'unixepoch')
+        FROM ({sources})
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """
+    return _merge(_fetch(query, partitions, [limit]), itemgetter(5, 0),
+                  reverse=True, limit=limit)
+
+
+def iter_stock_movements(product_id=None, chunk_size=PAGE_SIZE):
+    """Yield get_stock_movements() rows newest first, one page at a time."""
+    return _iter_pages(
+        lambda after: get_stock_movements_page(product_id, after, chunk_size), chunk_size)
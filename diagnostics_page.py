@@ -0,0 +1,140 @@
+"""
+diagnostics_page.py - Hidden page with SQL timing statistics.
+
+Opened with Ctrl+Shift+D from the main window. Shows the per-statement
+counters and recent slow queries collected by query_stats.
+"""
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QSplitter, QTextEdit
+)
+from PyQt5.QtCore import Qt
+
+import database as db
+import query_stats
+
+
+STAT_HEADERS = ["SQL", "Calls", "Total ms", "Avg ms", "Max ms", "Rows"]
+SLOW_HEADERS = ["Time", "ms", "Rows", "Params", "SQL"]
+
+
+class DiagnosticsPage(QWidget):
+    """Aggregated query statistics and the slow-query log."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.slow = []
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(16)
+
+        # Header
+        header = QHBoxLayout()
+        title = QLabel("🩺  Diagnostics")
+        title.setObjectName("sectionTitle")
+        header.addWidget(title)
+        header.addStretch()
+
+        self.enabled_check = QCheckBox("Record query timings")
+        self.enabled_check.toggled.connect(self.set_enabled)
+        header.addWidget(self.enabled_check)
+
+        refresh_btn = QPushButton("🔄  Refresh")
+        refresh_btn.setObjectName("outlineBtn")
+        refresh_btn.clicked.connect(self.refresh)
+        header.addWidget(refresh_btn)
+
+        reset_btn = QPushButton("🗑️  Reset")
+        reset_btn.setObjectName("dangerBtn")
+        reset_btn.clicked.connect(self.reset)
+        header.addWidget(reset_btn)
+
+        layout.addLayout(header)
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #5f6368;")
+        layout.addWidget(self.status_label)
+
+        splitter = QSplitter(Qt.Vertical)
+
+        self.stats_table = QTableWidget()
+        self.stats_table.setColumnCount(len(STAT_HEADERS))
+        self.stats_table.setHorizontalHeaderLabels(STAT_HEADERS)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stats_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.stats_table.setAlternatingRowColors(True)
+        splitter.addWidget(self.stats_table)
+
+        self.slow_table = QTableWidget()
+        self.slow_table.setColumnCount(len(SLOW_HEADERS))
+        self.slow_table.setHorizontalHeaderLabels(SLOW_HEADERS)
+        self.slow_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.slow_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.slow_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.slow_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.slow_table.currentCellChanged.connect(self.show_plan)
+        splitter.addWidget(self.slow_table)
+
+        self.plan_view = QTextEdit()
+        self.plan_view.setReadOnly(True)
+        self.plan_view.setPlaceholderText("Select a slow query to see its query plan.")
+        self.plan_view.setStyleSheet("font-family: monospace;")
+        splitter.addWidget(self.plan_view)
+
+        layout.addWidget(splitter)
+
+    def refresh(self):
+        self.enabled_check.blockSignals(True)
+        self.enabled_check.setChecked(query_stats.enabled)
+        self.enabled_check.blockSignals(False)
+        self.status_label.setText(
+            f"Instrumentation {'on' if query_stats.enabled else 'off'} · "
+            f"slow-query threshold {query_stats.slow_query_ms:g} ms")
+
+        stats, self.slow = query_stats.stats.snapshot()
+
+        self.stats_table.setRowCount(len(stats))
+        for row, (sql, calls, total, avg, worst, rows) in enumerate(stats):
+            values = [sql, str(calls), f"{total:,.1f}", f"{avg:,.2f}",
+                      f"{worst:,.2f}", f"{rows:,}"]
+            for col, val in enumerate(values):
+                item = QTableWidgetItem(val)
+                if col == 0:
+                    item.setToolTip(sql)
+                else:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.stats_table.setItem(row, col, item)
+
+        # Newest first
+        self.slow.reverse()
+        self.slow_table.setRowCount(len(self.slow))
+        for row, (when, sql, shape, rows, elapsed, _) in enumerate(self.slow):
+            values = [when, f"{elapsed:,.1f}", str(rows), shape, sql]
+            for col, val in enumerate(values):
+                item = QTableWidgetItem(val)
+                if col == 1:
+                    item.setForeground(Qt.red)
+                self.slow_table.setItem(row, col, item)
+        self.plan_view.clear()
+
+    def show_plan(self, row, *_):
+        if 0 <= row < len(self.slow):
+            _, sql, _, _, _, plan = self.slow[row]
+            self.plan_view.setPlainText(f"{sql}\n\n{plan or '(no plan)'}")
+
+    def set_enabled(self, on):
+        if on:
+            db.enable_instrumentation()
+        else:
+            db.disable_instrumentation()
+        self.refresh()
+
+    def reset(self):
+        query_stats.stats.reset()
+        self.refresh()
@@ -0,0 +1,168 @@
+"""
+exporter.py - Streaming exports of products, sales and stock movements.
+
+Rows are pulled from the database a page at a time and written straight to
+disk, so an export never holds the full table in memory. ExportWorker runs
+an export on a background thread and reports progress to the UI.
+
+Formats: plain CSV, gzip-compressed CSV and, when pyarrow is installed,
+Parquet (columnar, written one row group per chunk).
+"""
+
+import csv
+import gzip
+import importlib.util
+import os
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+import database as db
+
+
+CHUNK_SIZE = 5000
+
+FORMATS = {
+    # key: (label, file extension, file dialog filter)
+    "csv": ("CSV", ".csv", "CSV Files (*.csv)"),
+    "csv.gz": ("CSV (gzip)", ".csv.gz", "Compressed CSV (*.csv.gz)"),
+    "parquet": ("Parquet", ".parquet", "Parquet Files (*.parquet)"),
+}
+
+# Each export: column headers, column types (for columnar formats),
+# a row iterator factory and a row-count function for progress.
+EXPORTS = {
+    "products": (
+        ["ID", "Name", "SKU", "Category", "Price", "Cost Price",
+         "Quantity", "Low Stock Threshold", "Description",
+         "Created At", "Updated At"],
+        ["int", "str", "str", "str", "float", "float",
+         "int", "int", "str", "str", "str"],
+        lambda: (p[:11] for p in db.iter_products(CHUNK_SIZE)),
+        lambda: db.get_dashboard_kpis()[0],
+    ),
+    "sales": (
+        ["ID", "Product", "Qty Sold", "Sale Price", "Total", "Sale Date"],
+        ["int", "str", "int", "float", "float", "str"],
+        lambda: db.iter_sales(chunk_size=CHUNK_SIZE),
+        lambda: db.get_sales_totals()[0],
+    ),
+    "stock_movements": (
+        ["ID", "Product", "Type", "Quantity", "Note", "Date"],
+        ["int", "str", "str", "int", "str", "str"],
+        lambda: db.iter_stock_movements(chunk_size=CHUNK_SIZE),
+        lambda: db.count_stock_movements(),
+    ),
+}
+
+
+class ExportCancelled(Exception):
+    """Raised inside an export when the user cancels it."""
+
+
+def available_formats():
+    """Return the format keys usable in this environment."""
+    formats = ["csv", "csv.gz"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        formats.append("parquet")
+    return formats
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_csv(f, headers, chunks, on_chunk):
+    writer = csv.writer(f)
+    writer.writerow(headers)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        on_chunk(len(chunk))
+
+
+def _write_parquet(path, headers, types, chunks, on_chunk):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    schema = pa.schema([(h, arrow_types[t]) for h, t in zip(headers, types)])
+    with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+        for chunk in chunks:
+            columns = [pa.array(col, type=field.type)
+                       for col, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            on_chunk(len(chunk))
+
+
+def export(kind, path, fmt="csv", progress=None, is_cancelled=None):
+    """Stream the `kind` export (a key of EXPORTS) to `path` in format `fmt`.
+
+    `progress(written)` is called after every chunk; if `is_cancelled()`
+    returns True the partial file is removed and ExportCancelled raised.
+    Returns the number of rows written.
+    """
+    headers, types, rows, _ = EXPORTS[kind]
+    written = 0
+
+    def on_chunk(count):
+        nonlocal written
+        written += count
+        if progress:
+            progress(written)
+        if is_cancelled and is_cancelled():
+            raise ExportCancelled()
+
+    chunks = _chunks(rows(), CHUNK_SIZE)
+    try:
+        if fmt == "parquet":
+            _write_parquet(path, headers, types, chunks, on_chunk)
+        elif fmt == "csv.gz":
+            with gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6) as f:
+                _write_csv(f, headers, chunks, on_chunk)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                _write_csv(f, headers, chunks, on_chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return written
+
+
+class ExportWorker(QThread):
+    """Runs export() on a background thread with its own DB connection."""
+
+    progress = pyqtSignal(int, int)     # rows written, total rows
+    succeeded = pyqtSignal(str, int)    # path, rows written
+    failed = pyqtSignal(str)            # error message
+    cancelled = pyqtSignal()
+
+    def __init__(self, kind, path, fmt, parent=None):
+        super().__init__(parent)
+        self.kind = kind
+        self.path = path
+        self.fmt = fmt
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        try:
+            total = EXPORTS[self.kind][3]()
+            written = export(self.kind, self.path, self.fmt,
+                             progress=lambda n: self.progress.emit(n, total),
+                             is_cancelled=lambda: self._cancel)
+            self.succeeded.emit(self.path, written)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            db.close_connection()
@@ -0,0 +1,211 @@
+"""
+forecasting.py - Demand forecasts, reorder points and projected stockout dates.
+
+Each product's units sold per day (from the analytics.py columns) are
+smoothed exponentially, a day at a time for the whole catalog at once:
+
+    error     = units - level
+    level    += ALPHA * error
+    variance += ALPHA * (error ** 2 - variance)
+
+A product's series starts on its first sale, and both figures are bias
+corrected for the days since then, so a new product is not dragged
+towards zero. Today is left out until it is over. From these, per
+product:
+
+    forecast         expected units per day (the smoothed level)
+    velocity         average units per day over the last VELOCITY_DAYS
+    safety stock     SERVICE_Z * sqrt(variance) * sqrt(LEAD_TIME_DAYS)
+    reorder point    forecast * LEAD_TIME_DAYS + safety stock
+    stockout date    today + quantity / forecast, if the forecast is MIN_DEMAND or more
+
+The smoothing state is kept between calls, so a refresh only runs the
+days completed since the last one. Sales dated before that (or columns
+rebuilt after a delete) start it over from the first sale.
+"""
+
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+import analytics
+import database as db
+
+
+ALPHA = 0.1             # smoothing weight of the newest day (~19-day memory)
+LEAD_TIME_DAYS = 7      # days from reordering to restocking
+SERVICE_Z = 1.65        # safety factor; covers ~95% of lead times
+VELOCITY_DAYS = 28
+# Forecasts below this many units per day count as no demand (no stockout date).
+MIN_DEMAND = 0.01
+# get_projected_stockouts() lists products running out within this many days.
+STOCKOUT_HORIZON_DAYS = 30
+# Size of the days x products matrix of units smoothed per pass while catching up.
+BLOCK_CELLS = 1_000_000
+
+
+class DemandModel:
+    """Exponential smoothing state of daily units sold, for every product."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset(None, 0)
+
+    def _reset(self, generation, size):
+        self.generation = generation
+        self.next_day = None        # first day not smoothed yet
+        self.rows_seen = 0
+        self.level = np.zeros(size)
+        self.variance = np.zeros(size)
+        self.days = np.zeros(size, dtype=np.int64)     # days since first sale
+
+    def _grow(self, size):
+        """Make room for product ids below `size`."""
+        extra = size - len(self.level)
+        if extra > 0:
+            self.level = np.pad(self.level, (0, extra))
+            self.variance = np.pad(self.variance, (0, extra))
+            self.days = np.pad(self.days, (0, extra))
+
+    def _smooth(self, units):
+        """Run the smoothing over a (days, products) matrix of units sold."""
+        for day_units in units:
+            started = (self.days > 0) | (day_units > 0)
+            error = day_units - self.level
+            self.level += np.where(started, ALPHA * error, 0.0)
+            self.variance += np.where(started, ALPHA * (error * error - self.variance), 0.0)
+            self.days += started
+
+    def update(self, columns, today):
+        """Smooth the days completed before `today`; return (forecast, sigma, days).
+
+        Arrays are indexed by product id.
+        """
+        generation, days_sorted, (product_id, day, quantity, _) = columns.snapshot()
+        rows = len(day)
+        with self.lock:
+            if (generation != self.generation or rows < self.rows_seen
+                    or (self.next_day is not None and rows > self.rows_seen
+                        and day[self.rows_seen:].min() < self.next_day)):
+                self._reset(generation, 0)
+            if rows > self.rows_seen:
+                self._grow(int(product_id[self.rows_seen:].max()) + 1)
+            if self.next_day is None:
+                self.next_day = int(day.min()) if rows else today
+            size = len(self.level)
+            block = max(1, BLOCK_CELLS // max(size, 1))
+            while self.next_day < today:
+                first_day = self.next_day
+                last_day = min(first_day + block, today) - 1
+                span = analytics.day_range(day, days_sorted, first_day, last_day)
+                days = day[span]
+                mask = (days >= first_day) & (days <= last_day)
+                keys = (days[mask] - first_day).astype(np.int64) * size + product_id[span][mask]
+                count = last_day - first_day + 1
+                units = analytics.group_sum(keys, quantity[span][mask], count * size)
+                self._smooth(units.reshape(count, size))
+                self.next_day = last_day + 1
+            self.rows_seen = rows
+            # Bias correction for series shorter than the smoothing memory.
+            weight = 1 - (1 - ALPHA) ** self.days
+            seen = self.days > 0
+            forecast = np.divide(self.level, weight, out=np.zeros(size), where=seen)
+            variance = np.divide(self.variance, weight, out=np.zeros(size), where=seen)
+            return forecast, np.sqrt(np.maximum(variance, 0)), self.days.copy()
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_model():
+    folder = analytics.columns_folder()
+    with _models_lock:
+        model = _models.get(folder)
+        if model is None:
+            model = _models[folder] = DemandModel()
+    return model
+
+
+def _today():
+    """Return today as a day number (see database.DAY)."""
+    return db.to_timestamp() // db.DAY
+
+
+def _day_text(day):
+    return (date(1970, 1, 1) + timedelta(days=int(day))).isoformat()
+
+
+def _figures():
+    """Return (today, catalog, quantity, forecast, velocity, safety_stock,
+    reorder_point, days_left), the arrays aligned with the catalog rows."""
+    columns = analytics.get_columns()
+    today = _today()
+    forecast, sigma, days = _get_model().update(columns, today)
+
+    catalog = db.get_catalog()
+    ids = np.array([row[0] for row in catalog], dtype=np.int64)
+    quantity = np.array([row[6] for row in catalog], dtype=np.float64)
+    # Products added since the last sale loaded have no figures yet.
+    size = max(len(forecast), int(ids.max()) + 1 if len(ids) else 0)
+    forecast, sigma, days = (np.pad(a, (0, size - len(a)))[ids]
+                             for a in (forecast, sigma, days))
+
+    # Units over the last VELOCITY_DAYS full days, or the days since the first sale.
+    first_day = today - VELOCITY_DAYS
+    product_id, day, units, _ = columns.columns(first_day, today - 1)
+    recent = (day >= first_day) & (day < today)
+    sold = analytics.group_sum(product_id[recent], units[recent], size)[ids]
+    velocity = sold / np.clip(days, 1, VELOCITY_DAYS)
+
+    safety_stock = SERVICE_Z * sigma * np.sqrt(LEAD_TIME_DAYS)
+    reorder_point = forecast * LEAD_TIME_DAYS + safety_stock
+    days_left = np.divide(np.maximum(quantity, 0), forecast,
+                          out=np.full(len(ids), np.inf), where=forecast >= MIN_DEMAND)
+    days_left[days_left > 36500] = np.inf      # a century out counts as never
+    return (today, catalog, quantity, forecast, velocity, safety_stock, reorder_point,
+            days_left)
+
+
+def _rows(figures, indexes):
+    """Build get_forecasts() rows for the catalog positions in `indexes`."""
+    (today, catalog, _, forecast, velocity, safety_stock, reorder_point,
+     days_left) = figures
+    rows = []
+    for i in indexes:
+        row = catalog[i]
+        rows.append((row[0], row[1], row[2], row[3], row[6],
+                     float(forecast[i]), float(velocity[i]), float(safety_stock[i]),
+                     float(reorder_point[i]),
+                     _day_text(today + days_left[i]) if np.isfinite(days_left[i]) else None))
+    return rows
+
+
+def get_forecasts():
+    """Return the demand figures of every product, in catalog (name) order.
+
+    (id, name, sku, category, quantity, forecast, velocity, safety_stock,
+     reorder_point, stockout_date) with forecast and velocity in units per
+    day and stockout_date as 'YYYY-MM-DD', or None with no demand forecast.
+    """
+    figures = _figures()
+    return _rows(figures, range(len(figures[1])))
+
+
+def get_projected_stockouts(horizon_days=STOCKOUT_HORIZON_DAYS, limit=None):
+    """Return get_forecasts() rows of products that run out within horizon_days
+    or are at or below their reorder point, soonest first (those with no
+    stockout date last), at most `limit` of them.
+
+    The products are picked and ordered on the arrays, so only the rows
+    returned are built.
+    """
+    figures = _figures()
+    today, quantity, reorder_point, days_left = figures[0], figures[2], figures[6], figures[7]
+    stockout_day = np.floor(today + days_left)     # the day of the stockout date
+    picked = np.flatnonzero((quantity <= reorder_point)
+                            | (stockout_day <= today + horizon_days))
+    # A stable sort keeps products out on the same day in catalog (name) order.
+    picked = picked[np.argsort(stockout_day[picked], kind="stable")]
+    return _rows(figures, picked[:limit])
@@ -0,0 +1,162 @@
+"""
+group_commit.py - Batch many small writes into one transaction.
+
+Each record_sale(), add_stock_in() or add_stock_out() call normally
+commits on its own. When scanners send hundreds of events a second, the
+per-transaction overhead (and with durable=True, the fsync) dominates.
+GroupCommitWriter queues the calls and applies them on one writer thread
+in batches. A batch is committed when `flush_ms` milliseconds have passed
+since its first call, or once it holds `max_ops` calls, whichever comes
+first. With flush_ms=0 each batch is whatever queued up while the
+previous one was committing. Raise flush_ms where commits are slow (e.g.
+durable=True on a slow disk); benchmarks/bench_group_commit.py measures
+the trade-off.
+
+    writer = GroupCommitWriter(flush_ms=5)
+    future = writer.record_sale(product_id, 1, 9.5)
+    future.result()         # returns once the sale is committed
+
+Every call returns a concurrent.futures.Future. It resolves to the
+helper's return value once the batch that holds it has committed, or to
+the helper's exception. Each call runs in its own savepoint, so one that
+fails (e.g. InsufficientStockError) is rolled back alone and the rest of
+its batch still commits. A future cancelled before its batch starts is
+skipped. Use future.add_done_callback() for callbacks, which run on the
+writer thread. From asyncio, use asyncio.wrap_future(future).
+
+With durable=True the writer's connection uses PRAGMA synchronous = FULL,
+so a resolved future means the batch has been fsynced. The default
+(NORMAL, see database.CONNECTION_PRAGMAS) can lose the last commits on
+power loss, but not on an application crash.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import database as db
+
+
+DEFAULT_FLUSH_MS = 2
+DEFAULT_MAX_OPS = 500
+# Calls that may wait in the queue before submitting blocks the caller.
+DEFAULT_MAX_QUEUED = 10_000
+
+_FLUSH = object()   # marker op: commit the current batch now
+_STOP = object()    # marker op: commit and stop the writer thread
+
+
+class GroupCommitWriter:
+    """Applies queued database.py write helpers in group-committed batches."""
+
+    def __init__(self, flush_ms=DEFAULT_FLUSH_MS, max_ops=DEFAULT_MAX_OPS,
+                 durable=False, max_queued=DEFAULT_MAX_QUEUED):
+        self.flush_ms = flush_ms
+        self.max_ops = max_ops
+        self.durable = durable
+        self.queue = queue.Queue(max_queued)
+        self.closed = False
+        # Held while checking `closed` and queueing, so nothing is queued
+        # behind the stop marker, where the writer would never see it.
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.ops = 0
+        self.thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) for the next batch; return its Future.
+
+        `func` is a database.py write helper or any function that writes
+        through database.transaction() on the calling thread's connection.
+        """
+        future = Future()
+        self._put((future, func, args, kwargs))
+        return future
+
+    def record_sale(self, product_id, quantity_sold, sale_price):
+        return self.submit(db.record_sale, product_id, quantity_sold, sale_price)
+
+    def add_stock_in(self, product_id, quantity, note=""):
+        return self.submit(db.add_stock_in, product_id, quantity, note)
+
+    def add_stock_out(self, product_id, quantity, note=""):
+        return self.submit(db.add_stock_out, product_id, quantity, note)
+
+    def flush(self, timeout=None):
+        """Commit everything queued so far without waiting for the interval."""
+        future = Future()
+        self._put((future, _FLUSH, (), {}))
+        future.result(timeout)
+
+    def close(self):
+        """Commit what is queued and stop the writer thread."""
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.queue.put((None, _STOP, (), {}))
+        self.thread.join()
+
+    def _put(self, op):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            self.queue.put(op)
+
+    # ---- writer thread ----
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + self.flush_ms / 1000
+                while len(batch) < self.max_ops and batch[-1][1] not in (_FLUSH, _STOP):
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining > 0:
+                            batch.append(self.queue.get(timeout=remaining))
+                        else:
+                            # Past the deadline: take only what is already waiting.
+                            batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._commit(batch)
+                if batch[-1][1] is _STOP:
+                    return
+        finally:
+            db.close_connection()
+
+    def _commit(self, batch):
+        ops = [op for op in batch
+               if op[1] in (_FLUSH, _STOP) or op[0].set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            conn = db.get_connection()
+            if self.durable:
+                conn.execute("PRAGMA synchronous = FULL")
+            with db.transaction(immediate=True):
+                for _, func, args, kwargs in ops:
+                    if func is _FLUSH or func is _STOP:
+                        outcomes.append((None, None))
+                        continue
+                    try:
+                        with db.transaction():
+                            result = func(*args, **kwargs)
+                    except Exception as e:
+                        outcomes.append((None, e))
+                    else:
+                        outcomes.append((result, None))
+        except Exception as e:
+            # The batch as a whole did not commit (e.g. the database stayed
+            # locked by another process past BUSY_TIMEOUT).
+            outcomes = [(None, e)] * len(ops)
+        self.batches += 1
+        self.ops += sum(op[0] is not None and op[1] is not _FLUSH for op in ops)
+        for (future, *_), (result, error) in zip(ops, outcomes):
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
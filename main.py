@@ -2,8 +2,15 @@
 Smart Inventory Management System
 ==================================
 Entry point. Initializes the database, applies styles, and launches the PyQt5 app.
+
+Pass --measure-startup to print the time to the main window's first paint
+and exit (used by benchmarks/bench_startup.py).
 """
 
+import time
+
+_START = time.perf_counter()
+
 import sys
 import os
 
@@ -11,13 +18,30 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QEvent, QTimer
 
 import database as db
 from styles import GLOBAL_STYLE
 from main_window import MainWindow
 
 
+class FirstPaintProbe(QObject):
+    """Prints the time to the window's first paint, then quits the app."""
+
+    def __init__(self, app, window):
+        super().__init__(window)
+        self.app = app
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            elapsed_ms = (time.perf_counter() - _START) * 1000
+            print(f"first-paint-ms {elapsed_ms:.1f}", flush=True)
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self.app.quit)
+        return False
+
+
 def main():
     # Initialize database tables
     db.init_db()
@@ -27,6 +51,8 @@ def main():
     app.setStyleSheet(GLOBAL_STYLE)
 
     window = MainWindow()
+    if "--measure-startup" in sys.argv:
+        FirstPaintProbe(app, window)
     window.show()
 
     sys.exit(app.exec_())
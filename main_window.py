@@ -2,19 +2,30 @@
 main_window.py - Main application window with sidebar navigation.
 """
 
+import importlib
 import sys
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QPushButton, QStackedWidget, QFrame, QSizePolicy, QApplication
+    QPushButton, QStackedWidget, QFrame, QSizePolicy, QApplication, QMessageBox,
+    QShortcut
 )
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import Qt, QSize, QTimer, QEvent
+from PyQt5.QtGui import QIcon, QKeySequence
 
-from dashboard import DashboardPage
-from products_page import ProductsPage
-from stock_page import StockPage
-from sales_page import SalesPage
-from reports_page import ReportsPage
+from data_events import get_events
+from workers import get_loader, LoadingOverlay
+
+
+# Sidebar entries: (button text, module, page class). Page modules are
+# imported and built the first time they are opened, so their heavy
+# dependencies (matplotlib) stay out of startup.
+PAGES = [
+    ("📊  Dashboard", "dashboard", "DashboardPage"),
+    ("📦  Products", "products_page", "ProductsPage"),
+    ("🔄  Stock", "stock_page", "StockPage"),
+    ("💰  Sales", "sales_page", "SalesPage"),
+    ("📈  Reports", "reports_page", "ReportsPage"),
+]
 
 
 class MainWindow(QMainWindow):
@@ -53,15 +64,7 @@ class MainWindow(QMainWindow):
 
         # Navigation buttons
         self.nav_buttons = []
-        nav_items = [
-            ("📊  Dashboard", 0),
-            ("📦  Products", 1),
-            ("🔄  Stock", 2),
-            ("💰  Sales", 3),
-            ("📈  Reports", 4),
-        ]
-
-        for text, idx in nav_items:
+        for idx, (text, _, _) in enumerate(PAGES):
             btn = QPushButton(text)
             btn.setCheckable(True)
             btn.setCursor(Qt.PointingHandCursor)
@@ -82,25 +85,45 @@ class MainWindow(QMainWindow):
         # ---- Content area ----
         self.stack = QStackedWidget()
 
-        self.dashboard_page = DashboardPage()
-        self.products_page = ProductsPage()
-        self.stock_page = StockPage()
-        self.sales_page = SalesPage()
-        self.reports_page = ReportsPage()
-
-        self.stack.addWidget(self.dashboard_page)
-        self.stack.addWidget(self.products_page)
-        self.stack.addWidget(self.stock_page)
-        self.stack.addWidget(self.sales_page)
-        self.stack.addWidget(self.reports_page)
+        # Empty placeholders until each page is first opened
+        self.pages = [None] * len(PAGES)
+        for _ in PAGES:
+            self.stack.addWidget(QWidget())
 
         main_layout.addWidget(self.stack, stretch=1)
 
-        # Default to Dashboard
-        self.navigate(0)
+        self.loader = get_loader()
+        self.loader.finished.connect(self._on_load_finished)
+        self.loading_overlay = LoadingOverlay(self.stack)
+
+        # Writes made outside this window (another instance, a script) are
+        # picked up when the window is next activated.
+        self.events = get_events()
+        self.events.tables_changed.connect(self._on_tables_changed)
+
+        # Hidden diagnostics page (query timings), not in the sidebar
+        self.diagnostics_page = None
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_diagnostics)
+
+        # The Dashboard is opened after the window's first paint (see
+        # paintEvent), so the window appears before any page is built.
+        self._painted = False
+
+    def page(self, index):
+        """Return the page at `index`, importing and building it on first use."""
+        if self.pages[index] is None:
+            _, module_name, class_name = PAGES[index]
+            page_class = getattr(importlib.import_module(module_name), class_name)
+            placeholder = self.stack.widget(index)
+            self.pages[index] = page_class()
+            self.stack.insertWidget(index, self.pages[index])
+            self.stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+        return self.pages[index]
 
     def navigate(self, index):
         """Switch to the page at `index` and refresh its data."""
+        page = self.page(index)
         self.stack.setCurrentIndex(index)
 
         # Update button styles
@@ -110,7 +133,60 @@ class MainWindow(QMainWindow):
             btn.style().unpolish(btn)
             btn.style().polish(btn)
 
-        # Refresh current page
-        page = self.stack.currentWidget()
-        if hasattr(page, 'refresh'):
+        # Reload the page's data off the GUI thread, unless none of the
+        # tables it shows has changed since it last loaded. The request goes
+        # under the page's own LOADER_KEY, like the page's own reloads, so
+        # whichever was asked for last is the one shown.
+        if hasattr(page, 'is_stale') and not page.is_stale():
+            self.loading_overlay.hide()
+        elif hasattr(page, 'load_data'):
+            self.loading_overlay.cover()
+            self.loader.submit(page.LOADER_KEY, page.load_data, page.show_data,
+                               self._on_load_error)
+        elif hasattr(page, 'refresh'):
             page.refresh()
+
+    def show_diagnostics(self):
+        """Open the hidden diagnostics page (Ctrl+Shift+D)."""
+        if self.diagnostics_page is None:
+            from diagnostics_page import DiagnosticsPage
+            self.diagnostics_page = DiagnosticsPage()
+            self.stack.addWidget(self.diagnostics_page)
+        self.loading_overlay.hide()
+        self.stack.setCurrentWidget(self.diagnostics_page)
+        for btn in self.nav_buttons:
+            btn.setChecked(False)
+            btn.setProperty("active", False)
+            btn.style().unpolish(btn)
+            btn.style().polish(btn)
+        self.diagnostics_page.refresh()
+
+    def _on_load_finished(self, key):
+        page = self.stack.currentWidget()
+        if getattr(page, 'LOADER_KEY', None) == key:
+            self.loading_overlay.hide()
+
+    def _on_load_error(self, message):
+        self.loading_overlay.hide()
+        QMessageBox.critical(self, "Error", message)
+
+    def _on_tables_changed(self, tables):
+        page = self.stack.currentWidget()
+        if page in self.pages and hasattr(page, 'is_stale') and page.is_stale():
+            self.navigate(self.pages.index(page))
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.ActivationChange and self.isActiveWindow() and self._painted:
+            self.events.poll()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            QTimer.singleShot(0, lambda: self.navigate(0))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.loading_overlay.isVisible():
+            self.loading_overlay.setGeometry(self.stack.rect())
@@ -0,0 +1,134 @@
+"""
+product_picker.py - Product selector with incremental search.
+
+ProductPicker is a line edit with a completer popup. As the user types,
+the full-text index is searched (see database.search_products) for the
+best few matches instead of listing the whole catalog, so it opens
+instantly however many products there are. A SKU typed or scanned in full
+and confirmed with Enter selects that product directly.
+"""
+
+from PyQt5.QtWidgets import QLineEdit, QCompleter
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+
+import database as db
+from workers import get_loader
+
+
+# Wait this long after the last keystroke before querying.
+SEARCH_DEBOUNCE_MS = 150
+
+# Matches shown in the popup.
+MAX_MATCHES = 25
+
+# Full-text matches ranked per keystroke (see database.SEARCH_CANDIDATES);
+# fewer than a full search, since the popup shows only the best few.
+MATCH_CANDIDATES = 100
+
+
+class ProductMatchModel(QAbstractListModel):
+    """The current search matches (product rows), labelled for the popup."""
+
+    def __init__(self, label, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self.products = []
+
+    def set_products(self, products):
+        self.beginResetModel()
+        self.products = list(products)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.products)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        p = self.products[index.row()]
+        if role == Qt.DisplayRole:
+            return self.label(p)
+        if role == Qt.EditRole:
+            return p[1]
+        if role == Qt.UserRole:
+            return p
+        return None
+
+
+class ProductPicker(QLineEdit):
+    """Pick a product by typing part of its name, SKU, category or description."""
+
+    productChanged = pyqtSignal(object)     # product row, or None
+
+    def __init__(self, label=None, parent=None):
+        super().__init__(parent)
+        self._product = None
+        self.setPlaceholderText("🔍  Type a product name or SKU...")
+        self.setClearButtonEnabled(True)
+
+        self.model = ProductMatchModel(
+            label or (lambda p: f"{p[1]} (SKU: {p[2]}) — Qty: {p[6]}"), self)
+        self.completer = QCompleter(self.model, self)
+        # The model already holds the matches; show them as they are.
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(12)
+        self.completer.activated[QModelIndex].connect(self._on_activated)
+        self.setCompleter(self.completer)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.textEdited.connect(self.on_text_edited)
+        self.returnPressed.connect(self.on_return)
+
+    def product(self):
+        """Return the selected product row, or None."""
+        return self._product
+
+    def product_id(self):
+        return self._product[0] if self._product else None
+
+    def set_product(self, product):
+        self._product = product
+        if product is not None:
+            self.setText(product[1])
+        self.productChanged.emit(product)
+
+    def on_text_edited(self, text):
+        if self._product is not None:
+            self._product = None
+            self.productChanged.emit(None)
+        self.search_timer.start()
+
+    def run_search(self):
+        self.search_timer.stop()
+        keyword = self.text().strip()
+        if not keyword:
+            self.model.set_products([])
+            return
+        get_loader().submit(f"picker.{id(self)}",
+                            lambda: db.search_products(keyword, limit=MAX_MATCHES,
+                                                       candidates=MATCH_CANDIDATES),
+                            self._show_matches)
+
+    def _show_matches(self, products):
+        self.model.set_products(products)
+        if products and self.hasFocus():
+            self.completer.complete()
+
+    def _on_activated(self, index):
+        product = self.completer.completionModel().data(index, Qt.UserRole)
+        if product is not None:
+            self.set_product(product)
+
+    def on_return(self):
+        if self._product is not None:
+            return
+        # A full SKU (e.g. from a barcode scanner) selects the product outright.
+        product = db.get_product_by_sku(self.text().strip())
+        if product is None and len(self.model.products) == 1:
+            product = self.model.products[0]
+        if product is not None:
+            self.completer.popup().hide()
+            self.set_product(product)
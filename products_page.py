@@ -4,12 +4,39 @@ products_page.py - Product management page with CRUD operations.
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit,
-    QTableWidget, QTableWidgetItem, QHeaderView, QDialog, QFormLayout,
+    QTableView, QHeaderView, QDialog, QFormLayout,
     QComboBox, QDoubleSpinBox, QSpinBox, QTextEdit, QMessageBox, QFrame
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 import database as db
+from data_events import DataWatcher
+from table_models import Column, PagedTableModel
+from workers import get_loader
+
+
+# Wait this long after the last keystroke before querying.
+SEARCH_DEBOUNCE_MS = 200
+
+
+def _is_low(p):
+    return p[6] <= p[7]
+
+
+# p: id, name, sku, cat_name, price, cost, qty, threshold, desc, created, updated, cat_id
+PRODUCT_COLUMNS = [
+    Column("ID", lambda p: str(p[0])),
+    Column("Name", lambda p: p[1]),
+    Column("SKU", lambda p: p[2]),
+    Column("Category", lambda p: p[3] or "N/A"),
+    Column("Price", lambda p: f"₹{p[4]:,.2f}"),
+    Column("Cost", lambda p: f"₹{p[5]:,.2f}"),
+    Column("Qty", lambda p: str(p[6]),
+           color=lambda p: Qt.red if _is_low(p) else None,
+           tooltip=lambda p: "⚠ Low stock!" if _is_low(p) else None),
+    Column("Threshold", lambda p: str(p[7])),
+    Column("Updated", lambda p: p[10][:16] if p[10] else ""),
+]
 
 
 class ProductDialog(QDialog):
@@ -125,8 +152,16 @@ class ProductDialog(QDialog):
 class ProductsPage(QWidget):
     """Products listing and management page."""
 
+    # Tables this page reads; it is reloaded only when one changes.
+    DATA_TABLES = ("categories", "products")
+
+    # DataLoader key of every load of this page, opened or reloaded.
+    LOADER_KEY = "products"
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.keyword = ""
+        self.watcher = DataWatcher(self.DATA_TABLES)
         self.setup_ui()
 
     def setup_ui(self):
@@ -145,6 +180,10 @@ class ProductsPage(QWidget):
         self.search_input.setPlaceholderText("🔍  Search products...")
         self.search_input.setFixedWidth(250)
         self.search_input.textChanged.connect(self.on_search)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.run_search)
         header.addWidget(self.search_input)
 
         add_btn = QPushButton("➕  Add Product")
@@ -155,15 +194,12 @@ class ProductsPage(QWidget):
         layout.addLayout(header)
 
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(9)
-        self.table.setHorizontalHeaderLabels([
-            "ID", "Name", "SKU", "Category", "Price",
-            "Cost", "Qty", "Threshold", "Updated"
-        ])
+        self.model = PagedTableModel(PRODUCT_COLUMNS, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.setAlternatingRowColors(True)
         self.table.doubleClicked.connect(self.edit_product)
         layout.addWidget(self.table)
@@ -185,46 +221,57 @@ class ProductsPage(QWidget):
         layout.addLayout(btn_bar)
 
     def refresh(self):
-        self.load_products(db.get_all_products())
-
-    def load_products(self, products):
-        self.table.setRowCount(0)
-        for row_data in products:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            # id, name, sku, cat_name, price, cost, qty, threshold, desc, created, updated, cat_id
-            display = [
-                str(row_data[0]),
-                row_data[1],
-                row_data[2],
-                row_data[3] or "N/A",
-                f"₹{row_data[4]:,.2f}",
-                f"₹{row_data[5]:,.2f}",
-                str(row_data[6]),
-                str(row_data[7]),
-                row_data[10][:16] if row_data[10] else ""
-            ]
-            for col, val in enumerate(display):
-                item = QTableWidgetItem(val)
-                item.setTextAlignment(Qt.AlignCenter)
-                # Highlight low stock
-                if col == 6 and row_data[6] <= row_data[7]:
-                    item.setForeground(Qt.red)
-                    item.setToolTip("⚠ Low stock!")
-                self.table.setItem(row, col, item)
+        """Reload the current search or page off the GUI thread."""
+        get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                            self.show_load_error)
+
+    def is_stale(self):
+        return self.watcher.is_stale()
+
+    def load_data(self):
+        """Query the first page for the current search; safe off the GUI thread."""
+        versions = self.watcher.versions()
+        keyword = self.keyword
+        if keyword:
+            # Search results are ranked, not keyed on (name, id); page by
+            # offset through the ranking, which search_products caches.
+            loaded = [0]
+
+            def fetch(after, limit):
+                offset = 0 if after is None else loaded[0]
+                rows = db.search_products(keyword, limit, offset)
+                loaded[0] = offset + len(rows)
+                return rows
+        else:
+            fetch = db.get_products_page
+        return versions, fetch, fetch(None, self.model.page_size)
+
+    def show_data(self, data):
+        versions, fetch, first_page = data
+        self.model.set_fetch(fetch, first_page)
+        self.watcher.mark(versions)
 
     def on_search(self, text):
-        if text.strip():
-            self.load_products(db.search_products(text.strip()))
-        else:
-            self.refresh()
+        # Restarting the timer drops the pending query for text the user
+        # has already typed past, so only the latest text is searched.
+        self.search_timer.start()
+
+    def run_search(self):
+        self.search_timer.stop()
+        self.keyword = self.search_input.text().strip()
+        # A newer search supersedes one still running, whose result is dropped.
+        get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                            self.show_load_error)
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Error", message)
 
     def get_selected_product_id(self):
         rows = self.table.selectionModel().selectedRows()
         if not rows:
             QMessageBox.information(self, "Select", "Please select a product first.")
             return None
-        return int(self.table.item(rows[0].row(), 0).text())
+        return self.model.row(rows[0].row())[0]
 
     def add_product(self):
         dlg = ProductDialog(self)
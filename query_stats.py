@@ -0,0 +1,236 @@
+"""
+query_stats.py - Optional instrumentation of every SQL statement.
+
+When enabled, database.py opens its connections with InstrumentedConnection,
+whose execute() / executemany() return a TimedCursor. The cursor times the
+statement from execute until its rows have been consumed, counts the rows
+and records the result in `stats`, grouped by SQL text. Statements slower
+than the threshold also go to the "inventory.slow_queries" logger, together
+with their EXPLAIN QUERY PLAN, and are kept in a short in-memory list for
+the diagnostics page.
+
+Enable it with the environment variables
+
+    INVENTORY_QUERY_STATS=1           turn instrumentation on
+    INVENTORY_SLOW_QUERY_MS=50        slow-query threshold in milliseconds
+    INVENTORY_SLOW_LOG=slow.log       also append slow queries to this file
+
+or at run time with database.enable_instrumentation(). Parameter values are
+never recorded, only their shape.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("inventory.slow_queries")
+
+enabled = os.environ.get("INVENTORY_QUERY_STATS", "") not in ("", "0")
+slow_query_ms = float(os.environ.get("INVENTORY_SLOW_QUERY_MS", "50"))
+
+# Statements worth an EXPLAIN QUERY PLAN when slow.
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Runs of placeholders ("?, ?, ?") vary with the batch size; fold them so
+# the same query groups together.
+_PLACEHOLDER_RUN = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize(sql):
+    """Return `sql` on one line, with placeholder lists folded."""
+    return _PLACEHOLDER_RUN.sub("?, …", " ".join(sql.split()))
+
+
+def param_shape(params):
+    """Describe bound parameters by type only, e.g. "(int, str)"."""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+class QueryStats:
+    """Per-statement counters and the most recent slow queries (thread-safe)."""
+
+    def __init__(self, keep_slow=100):
+        self._lock = threading.Lock()
+        self._stats = {}    # normalized sql -> [calls, total_ms, max_ms, rows]
+        self.slow = deque(maxlen=keep_slow)
+
+    def record(self, sql, shape, rows, elapsed_ms):
+        key = normalize(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += elapsed_ms
+            entry[2] = max(entry[2], elapsed_ms)
+            entry[3] += max(rows, 0)
+
+    def add_slow(self, sql, shape, rows, elapsed_ms, plan):
+        with self._lock:
+            self.slow.append((time.strftime("%Y-%m-%d %H:%M:%S"), normalize(sql),
+                              shape, rows, elapsed_ms, plan))
+
+    def snapshot(self):
+        """Return [(sql, calls, total_ms, avg_ms, max_ms, rows)], slowest total first."""
+        with self._lock:
+            rows = [(sql, calls, total, total / calls, worst, count)
+                    for sql, (calls, total, worst, count) in self._stats.items()]
+            slow = list(self.slow)
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows, slow
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow.clear()
+
+
+stats = QueryStats()
+
+
+class TimedCursor:
+    """Wraps a sqlite3.Cursor, timing the statement until its rows are consumed.
+
+    The time spent in execute and in every fetch is added up. The statement
+    is recorded once, when the rows run out, on close(), or when the cursor
+    is discarded, so single-row lookups and writes are recorded too.
+    """
+
+    def __init__(self, conn, cursor, sql, shape, elapsed):
+        self._conn = conn
+        self._cursor = cursor
+        self._sql = sql
+        self._shape = shape
+        self._elapsed = elapsed
+        self._rows = 0
+        self._done = False
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._elapsed += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, size or self._cursor.arraysize)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass    # never raise from a finalizer
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        rows = self._rows if self._cursor.description else self._cursor.rowcount
+        elapsed_ms = self._elapsed * 1000
+        stats.record(self._sql, self._shape, rows, elapsed_ms)
+        if elapsed_ms >= slow_query_ms:
+            self._conn.log_slow(self._sql, self._shape, rows, elapsed_ms)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose statements are timed and recorded."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        return TimedCursor(self, cursor, sql, param_shape(parameters),
+                           time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        shape = (f"{len(seq_of_parameters)} x "
+                 f"{param_shape(seq_of_parameters[0]) if seq_of_parameters else '()'}")
+        start = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        return TimedCursor(self, cursor, sql, shape, time.perf_counter() - start)
+
+    def explain(self, sql, parameters=()):
+        """Return the EXPLAIN QUERY PLAN of `sql` as indented text."""
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return ""
+        try:
+            plan = super().execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return f"(no plan: {e})"
+        depth = {0: 0}
+        lines = []
+        for node, parent, _, detail in plan:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append("  " * (depth[node] - 1) + detail)
+        return "\n".join(lines)
+
+    def log_slow(self, sql, shape, rows, elapsed_ms):
+        # The plan is taken with NULL parameters: the values are not kept,
+        # and SQLite chooses the plan from the statement, not the values.
+        plan = self.explain(sql, [None] * sql.count("?") if "?" in sql else ())
+        stats.add_slow(sql, shape, rows, elapsed_ms, plan)
+        logger.warning("slow query %.1f ms, %s rows, params %s\n    %s\n%s",
+                       elapsed_ms, rows, shape, normalize(sql),
+                       "\n".join("    " + line for line in plan.splitlines()))
+
+
+def enable(slow_ms=None, log_path=None):
+    """Turn instrumentation on for connections opened from now on."""
+    global enabled, slow_query_ms
+    enabled = True
+    if slow_ms is not None:
+        slow_query_ms = slow_ms
+    if log_path:
+        handler = logging.FileHandler(log_path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+if enabled and os.environ.get("INVENTORY_SLOW_LOG"):
+    enable(log_path=os.environ["INVENTORY_SLOW_LOG"])
@@ -1,21 +1,24 @@
 """
-reports_page.py - Reports & Charts page with Matplotlib visualizations and CSV export.
+reports_page.py - Reports & Charts page with Matplotlib visualizations and data export.
 """
 
 import os
 from datetime import datetime
 
-import pandas as pd
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget,
     QFileDialog, QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView,
-    QFrame, QSizePolicy
+    QFrame, QSizePolicy, QComboBox, QProgressDialog
 )
 from PyQt5.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+import analytics
 import database as db
+import exporter
+from data_events import DataWatcher
+from workers import get_loader
 
 
 class ChartCanvas(FigureCanvas):
@@ -29,11 +32,29 @@ class ChartCanvas(FigureCanvas):
 
 
 class ReportsPage(QWidget):
-    """Reports page with charts and CSV export."""
+    """Reports page with charts and data export."""
+
+    # DataLoader key of every load of this page, opened or reloaded.
+    LOADER_KEY = "reports"
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.export_worker = None
+        self.current_tab = 0
         self.setup_ui()
+        # One (watcher over the tables read, query, renderer) per tab, in tab order
+        self.charts = [
+            (DataWatcher(["sales"]),
+             analytics.get_sales_summary, self._draw_sales_trend),
+            (DataWatcher(["sales", "products"]),
+             lambda: analytics.get_top_products(10), self._draw_top_products),
+            (DataWatcher(["sales", "products", "categories"]),
+             analytics.get_category_sales, self._draw_category_pie),
+            (DataWatcher(["products"]),
+             lambda: db.get_catalog()[:20], self._draw_stock_overview),
+            (DataWatcher(["sales", "products"]),
+             lambda: analytics.get_product_profit(10), self._draw_profit_analysis),
+        ]
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -47,25 +68,30 @@ class ReportsPage(QWidget):
         header.addWidget(title)
         header.addStretch()
 
-        export_products_btn = QPushButton("📄  Export Products CSV")
+        self.format_combo = QComboBox()
+        for fmt in exporter.available_formats():
+            self.format_combo.addItem(exporter.FORMATS[fmt][0], fmt)
+        header.addWidget(self.format_combo)
+
+        export_products_btn = QPushButton("📄  Export Products")
         export_products_btn.setObjectName("outlineBtn")
-        export_products_btn.clicked.connect(self.export_products_csv)
+        export_products_btn.clicked.connect(self.export_products)
         header.addWidget(export_products_btn)
 
-        export_sales_btn = QPushButton("📄  Export Sales CSV")
+        export_sales_btn = QPushButton("📄  Export Sales")
         export_sales_btn.setObjectName("outlineBtn")
-        export_sales_btn.clicked.connect(self.export_sales_csv)
+        export_sales_btn.clicked.connect(self.export_sales)
         header.addWidget(export_sales_btn)
 
-        export_stock_btn = QPushButton("📄  Export Stock CSV")
+        export_stock_btn = QPushButton("📄  Export Stock")
         export_stock_btn.setObjectName("primaryBtn")
-        export_stock_btn.clicked.connect(self.export_stock_csv)
+        export_stock_btn.clicked.connect(self.export_stock)
         header.addWidget(export_stock_btn)
 
         layout.addLayout(header)
 
         # Tabs
-        tabs = QTabWidget()
+        self.tabs = tabs = QTabWidget()
 
         # ---- Sales Trend chart ----
         sales_tab = QWidget()
@@ -107,23 +133,47 @@ class ReportsPage(QWidget):
         pl.addWidget(self.profit_canvas)
         tabs.addTab(profit_tab, "💹  Profit Analysis")
 
+        tabs.currentChanged.connect(self.on_tab_changed)
         layout.addWidget(tabs)
 
+    # ---- Data loading ----
+    # Only the visible chart is drawn. Each tab remembers the versions of
+    # the tables it was drawn from, so revisiting the page or a tab skips
+    # the query and redraw entirely when none of them has changed since.
+
+    def is_stale(self):
+        """Check whether the visible chart is out of date."""
+        return self.charts[self.current_tab][0].is_stale()
+
     def refresh(self):
-        self._draw_sales_trend()
-        self._draw_top_products()
-        self._draw_category_pie()
-        self._draw_stock_overview()
-        self._draw_profit_analysis()
+        if self.is_stale():
+            self.show_data(self.load_data())
+
+    def load_data(self):
+        """Query the visible chart's data; safe off the GUI thread."""
+        index = self.current_tab
+        watcher, query, _ = self.charts[index]
+        return index, watcher.versions(), query()
+
+    def show_data(self, data):
+        index, versions, chart_data = data
+        watcher, _, render = self.charts[index]
+        render(chart_data)
+        watcher.mark(versions)
+
+    def on_tab_changed(self, index):
+        self.current_tab = index
+        if self.is_stale():
+            get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                                lambda message: QMessageBox.critical(self, "Error", message))
 
     # ---- Chart renderers ----
 
-    def _draw_sales_trend(self):
+    def _draw_sales_trend(self, data):
         self.sales_canvas.fig.clear()
         ax = self.sales_canvas.fig.add_subplot(111)
         ax.set_facecolor('#fafafa')
 
-        data = db.get_sales_summary()
         if data:
             days = [r[0] for r in data]
             revenue = [r[1] for r in data]
@@ -149,12 +199,11 @@ class ReportsPage(QWidget):
         self.sales_canvas.fig.tight_layout()
         self.sales_canvas.draw()
 
-    def _draw_top_products(self):
+    def _draw_top_products(self, data):
         self.top_canvas.fig.clear()
         ax = self.top_canvas.fig.add_subplot(111)
         ax.set_facecolor('#fafafa')
 
-        data = db.get_top_products(10)
         if data:
             names = [r[0][:20] for r in data]
             revenue = [r[2] for r in data]
@@ -176,11 +225,10 @@ class ReportsPage(QWidget):
         self.top_canvas.fig.tight_layout()
         self.top_canvas.draw()
 
-    def _draw_category_pie(self):
+    def _draw_category_pie(self, data):
         self.cat_canvas.fig.clear()
         ax = self.cat_canvas.fig.add_subplot(111)
 
-        data = db.get_category_sales()
         if data:
             labels = [r[0] or "Uncategorized" for r in data]
             values = [r[1] for r in data]
@@ -203,16 +251,15 @@ class ReportsPage(QWidget):
         self.cat_canvas.fig.tight_layout()
         self.cat_canvas.draw()
 
-    def _draw_stock_overview(self):
+    def _draw_stock_overview(self, products):
         self.stock_canvas.fig.clear()
         ax = self.stock_canvas.fig.add_subplot(111)
         ax.set_facecolor('#fafafa')
 
-        products = db.get_all_products()
-        if products:
-            names = [p[1][:18] for p in products[:20]]  # limit for readability
-            qtys = [p[6] for p in products[:20]]
-            thresholds = [p[7] for p in products[:20]]
+        if products:  # first 20 only, for readability
+            names = [p[1][:18] for p in products]
+            qtys = [p[6] for p in products]
+            thresholds = [p[7] for p in products]
 
             x = range(len(names))
             bar_colors = ['#db4437' if q <= t else '#0f9d58' for q, t in zip(qtys, thresholds)]
@@ -232,26 +279,11 @@ class ReportsPage(QWidget):
         self.stock_canvas.fig.tight_layout()
         self.stock_canvas.draw()
 
-    def _draw_profit_analysis(self):
+    def _draw_profit_analysis(self, rows):
         self.profit_canvas.fig.clear()
         ax = self.profit_canvas.fig.add_subplot(111)
         ax.set_facecolor('#fafafa')
 
-        # Calculate per-product profit from sales
-        conn = db.get_connection()
-        rows = conn.execute("""
-            SELECT p.name, 
-                   SUM(s.total) as revenue,
-                   SUM(s.quantity_sold * p.cost_price) as cost,
-                   SUM(s.total) - SUM(s.quantity_sold * p.cost_price) as profit
-            FROM sales s
-            JOIN products p ON s.product_id = p.id
-            GROUP BY p.name
-            ORDER BY profit DESC
-            LIMIT 10
-        """).fetchall()
-        conn.close()
-
         if rows:
             names = [r[0][:18] for r in rows]
             revenue = [r[1] for r in rows]
@@ -279,48 +311,66 @@ class ReportsPage(QWidget):
         self.profit_canvas.fig.tight_layout()
         self.profit_canvas.draw()
 
-    # ---- CSV Exports ----
+    # ---- Exports ----
 
-    def export_products_csv(self):
-        products = db.get_all_products()
-        if not products:
-            QMessageBox.information(self, "No Data", "No products to export.")
-            return
-        df = pd.DataFrame(products, columns=[
-            "ID", "Name", "SKU", "Category", "Price", "Cost Price",
-            "Quantity", "Low Stock Threshold", "Description",
-            "Created At", "Updated At", "Category ID"
-        ])
-        df = df.drop(columns=["Category ID"])
-        self._save_csv(df, "products")
-
-    def export_sales_csv(self):
-        sales = db.get_sales()
-        if not sales:
-            QMessageBox.information(self, "No Data", "No sales to export.")
+    def export_products(self):
+        self._start_export("products", "No products to export.")
+
+    def export_sales(self):
+        self._start_export("sales", "No sales to export.")
+
+    def export_stock(self):
+        self._start_export("stock_movements", "No stock movements to export.")
+
+    def _start_export(self, kind, empty_message):
+        """Ask for a destination and stream the export on a worker thread."""
+        if self.export_worker is not None:
+            QMessageBox.information(self, "Export Running",
+                                    "Please wait for the current export to finish.")
             return
-        df = pd.DataFrame(sales, columns=[
-            "ID", "Product", "Qty Sold", "Sale Price", "Total", "Sale Date"
-        ])
-        self._save_csv(df, "sales")
-
-    def export_stock_csv(self):
-        movements = db.get_stock_movements()
-        if not movements:
-            QMessageBox.information(self, "No Data", "No stock movements to export.")
+        total = exporter.EXPORTS[kind][3]()
+        if not total:
+            QMessageBox.information(self, "No Data", empty_message)
             return
-        df = pd.DataFrame(movements, columns=[
-            "ID", "Product", "Type", "Quantity", "Note", "Date"
-        ])
-        self._save_csv(df, "stock_movements")
 
-    def _save_csv(self, df, prefix):
+        fmt = self.format_combo.currentData()
+        _, ext, file_filter = exporter.FORMATS[fmt]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_name = f"{prefix}_{timestamp}.csv"
-        path, _ = QFileDialog.getSaveFileName(
-            self, "Save CSV", default_name, "CSV Files (*.csv)"
-        )
-        if path:
-            df.to_csv(path, index=False)
-            QMessageBox.information(self, "Exported ✅",
-                                    f"Data exported successfully to:\n{path}")
+        default_name = f"{kind}_{timestamp}{ext}"
+        path, _ = QFileDialog.getSaveFileName(self, "Export", default_name, file_filter)
+        if not path:
+            return
+
+        self.export_progress = QProgressDialog(
+            f"Exporting {total:,} rows…", "Cancel", 0, total, self)
+        self.export_progress.setWindowTitle("Export")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(300)
+
+        worker = exporter.ExportWorker(kind, path, fmt, self)
+        worker.progress.connect(self._on_export_progress)
+        worker.succeeded.connect(self._on_export_succeeded)
+        worker.failed.connect(self._on_export_failed)
+        worker.finished.connect(self._on_export_finished)
+        self.export_progress.canceled.connect(worker.cancel)
+        self.export_worker = worker
+        worker.start()
+
+    def _on_export_progress(self, written, total):
+        if written > self.export_progress.maximum():
+            self.export_progress.setMaximum(written)
+        self.export_progress.setValue(written)
+
+    def _on_export_succeeded(self, path, written):
+        self.export_progress.reset()
+        QMessageBox.information(self, "Exported ✅",
+                                f"{written:,} rows exported successfully to:\n{path}")
+
+    def _on_export_failed(self, message):
+        self.export_progress.reset()
+        QMessageBox.critical(self, "Export Failed", message)
+
+    def _on_export_finished(self):
+        self.export_progress.reset()
+        self.export_worker.deleteLater()
+        self.export_worker = None
@@ -4,12 +4,27 @@ sales_page.py - Sales recording and listing page.
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit,
-    QTableWidget, QTableWidgetItem, QHeaderView, QDialog, QFormLayout,
-    QComboBox, QDoubleSpinBox, QSpinBox, QMessageBox, QDateEdit
+    QTableView, QHeaderView, QDialog, QFormLayout,
+    QDoubleSpinBox, QSpinBox, QMessageBox, QDateEdit
 )
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import QDate
 
 import database as db
+from data_events import DataWatcher
+from product_picker import ProductPicker
+from table_models import Column, PagedTableModel
+from workers import get_loader
+
+
+# s: id, product name, qty sold, price, total, date
+SALE_COLUMNS = [
+    Column("ID", lambda s: str(s[0])),
+    Column("Product", lambda s: s[1]),
+    Column("Qty Sold", lambda s: str(s[2])),
+    Column("Price", lambda s: f"₹{s[3]:,.2f}"),
+    Column("Total", lambda s: f"₹{s[4]:,.2f}"),
+    Column("Date", lambda s: s[5][:16]),
+]
 
 
 class SaleDialog(QDialog):
@@ -26,15 +41,10 @@ class SaleDialog(QDialog):
         layout.setSpacing(12)
         layout.setContentsMargins(24, 24, 24, 24)
 
-        self.product_combo = QComboBox()
-        products = db.get_all_products()
-        self.prod_map = {}
-        for p in products:
-            label = f"{p[1]} (SKU: {p[2]}) — Qty: {p[6]} — ₹{p[4]:,.2f}"
-            self.product_combo.addItem(label, p[0])
-            self.prod_map[p[0]] = p
-        self.product_combo.currentIndexChanged.connect(self.on_product_changed)
-        layout.addRow("Product", self.product_combo)
+        self.product_picker = ProductPicker(
+            lambda p: f"{p[1]} (SKU: {p[2]}) — Qty: {p[6]} — ₹{p[4]:,.2f}")
+        self.product_picker.productChanged.connect(self.on_product_changed)
+        layout.addRow("Product", self.product_picker)
 
         self.qty_input = QSpinBox()
         self.qty_input.setRange(1, 9999999)
@@ -53,9 +63,6 @@ class SaleDialog(QDialog):
         self.total_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #0f9d58;")
         layout.addRow("Total", self.total_label)
 
-        # Trigger initial price
-        self.on_product_changed()
-
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("💰  Record Sale")
         save_btn.setObjectName("successBtn")
@@ -63,15 +70,17 @@ class SaleDialog(QDialog):
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setObjectName("outlineBtn")
         cancel_btn.clicked.connect(self.reject)
+        # Enter in the picker selects a product; it must not submit the form.
+        save_btn.setAutoDefault(False)
+        cancel_btn.setAutoDefault(False)
         btn_layout.addStretch()
         btn_layout.addWidget(cancel_btn)
         btn_layout.addWidget(save_btn)
         layout.addRow(btn_layout)
 
-    def on_product_changed(self):
-        pid = self.product_combo.currentData()
-        if pid and pid in self.prod_map:
-            self.price_input.setValue(self.prod_map[pid][4])
+    def on_product_changed(self, product):
+        if product is not None:
+            self.price_input.setValue(product[4])
         self.update_total()
 
     def update_total(self):
@@ -79,7 +88,7 @@ class SaleDialog(QDialog):
         self.total_label.setText(f"₹ {total:,.2f}")
 
     def save(self):
-        product_id = self.product_combo.currentData()
+        product_id = self.product_picker.product_id()
         qty = self.qty_input.value()
         price = self.price_input.value()
 
@@ -87,17 +96,13 @@ class SaleDialog(QDialog):
             QMessageBox.warning(self, "Error", "Please select a product.")
             return
 
-        product = self.prod_map.get(product_id)
-        if product and qty > product[6]:
-            QMessageBox.warning(
-                self, "Insufficient Stock",
-                f"Only {product[6]} units available."
-            )
-            return
-
+        # Stock is checked by the write itself, against the current stock
+        # rather than what the dialog showed when it opened.
         try:
             db.record_sale(product_id, qty, price)
             self.accept()
+        except db.InsufficientStockError as e:
+            QMessageBox.warning(self, "Insufficient Stock", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
@@ -105,8 +110,15 @@ class SaleDialog(QDialog):
 class SalesPage(QWidget):
     """Sales page with history and recording."""
 
+    # Tables this page reads; it is reloaded only when one changes.
+    DATA_TABLES = ("products", "sales")
+
+    # DataLoader key of every load of this page, opened or reloaded.
+    LOADER_KEY = "sales"
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.watcher = DataWatcher(self.DATA_TABLES)
         self.setup_ui()
 
     def setup_ui(self):
@@ -152,36 +164,37 @@ class SalesPage(QWidget):
         layout.addLayout(self.summary_layout)
 
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels([
-            "ID", "Product", "Qty Sold", "Price", "Total", "Date"
-        ])
+        self.model = PagedTableModel(SALE_COLUMNS, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.setAlternatingRowColors(True)
         layout.addWidget(self.table)
 
     def refresh(self):
-        self._load_sales(db.get_sales())
-
-    def _load_sales(self, sales):
-        self.table.setRowCount(0)
-        total_revenue = 0
-        total_units = 0
-
-        for s in sales:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            items = [str(s[0]), s[1], str(s[2]),
-                     f"₹{s[3]:,.2f}", f"₹{s[4]:,.2f}", s[5][:16]]
-            total_revenue += s[4]
-            total_units += s[2]
-            for col, val in enumerate(items):
-                item = QTableWidgetItem(val)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(row, col, item)
+        """Reload the sales list off the GUI thread."""
+        get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                            self.show_load_error)
+
+    def is_stale(self):
+        return self.watcher.is_stale()
+
+    def load_data(self, start=None, end=None):
+        """Query the first page and totals; safe off the GUI thread."""
+        versions = self.watcher.versions()
+
+        def fetch(after, limit):
+            return db.get_sales_page(start, end, after, limit)
+        return (versions, fetch, fetch(None, self.model.page_size),
+                db.get_sales_totals(start, end))
+
+    def show_data(self, data):
+        versions, fetch, first_page, totals = data
+        self.model.set_fetch(fetch, first_page)
+        self.watcher.mark(versions)
+        sale_count, total_units, total_revenue = totals
 
         # Update summary
         while self.summary_layout.count():
@@ -190,7 +203,7 @@ class SalesPage(QWidget):
                 child.widget().deleteLater()
 
         for label_text, value, color in [
-            ("Total Sales", str(len(sales)), "#1a73e8"),
+            ("Total Sales", str(sale_count), "#1a73e8"),
             ("Units Sold", str(total_units), "#8e24aa"),
             ("Revenue", f"₹{total_revenue:,.2f}", "#0f9d58"),
         ]:
@@ -203,9 +216,14 @@ class SalesPage(QWidget):
         self.summary_layout.addStretch()
 
     def apply_filter(self):
-        start = self.date_from.date().toString("yyyy-MM-dd") + " 00:00:00"
-        end = self.date_to.date().toString("yyyy-MM-dd") + " 23:59:59"
-        self._load_sales(db.get_sales(start, end))
+        # Whole days, as timestamps: an index range scan on sales.sale_date.
+        start = db.to_timestamp(self.date_from.date().toPyDate())
+        end = db.to_timestamp(self.date_to.date().toPyDate()) + db.DAY - 1
+        get_loader().submit(self.LOADER_KEY, lambda: self.load_data(start, end),
+                            self.show_data, self.show_load_error)
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Error", message)
 
     def new_sale(self):
         dlg = SaleDialog(self)
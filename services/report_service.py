@@ -1,19 +1,13 @@
 import pandas as pd
-from database.db_manager import connect
+
+import analytics
+import database as db
 
 def export_products_csv():
-    conn = connect()
-    df = pd.read_sql_query("SELECT * FROM products", conn)
+    df = pd.read_sql_query("SELECT * FROM products", db.get_connection())
     df.to_csv("products_report.csv", index=False)
-    conn.close()
 
 def sales_summary():
-    conn = connect()
-    df = pd.read_sql_query("""
-        SELECT p.name, SUM(s.quantity_sold) as total_sold
-        FROM sales s
-        JOIN products p ON s.product_id = p.id
-        GROUP BY p.name
-    """, conn)
-    conn.close()
-    return df
\ No newline at end of file
+    rows = analytics.get_top_products(limit=None)
+    return pd.DataFrame([(name, units) for name, units, _ in rows],
+                        columns=["name", "total_sold"])
@@ -4,12 +4,52 @@ stock_page.py - Stock tracking page with stock-in / stock-out and movement histo
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit,
-    QTableWidget, QTableWidgetItem, QHeaderView, QDialog, QFormLayout,
-    QComboBox, QSpinBox, QTextEdit, QMessageBox, QFrame, QTabWidget
+    QTableWidget, QTableWidgetItem, QTableView, QHeaderView, QDialog, QFormLayout,
+    QSpinBox, QTextEdit, QMessageBox, QFrame, QTabWidget
 )
 from PyQt5.QtCore import Qt
 
 import database as db
+import forecasting
+from data_events import DataWatcher
+from product_picker import ProductPicker
+from table_models import Column, PagedTableModel
+from workers import get_loader
+
+
+def _low_color(p):
+    return Qt.red if p[6] <= p[7] else None
+
+
+# p: id, name, sku, cat_name, price, cost, qty, threshold, ...
+STOCK_COLUMNS = [
+    Column("ID", lambda p: str(p[0])),
+    Column("Product", lambda p: p[1]),
+    Column("SKU", lambda p: p[2]),
+    Column("Category", lambda p: p[3] or "N/A"),
+    Column("Qty", lambda p: str(p[6]), color=_low_color),
+    Column("Threshold", lambda p: str(p[7])),
+    Column("Status", lambda p: "✅ OK" if p[6] > p[7] else "⚠️ LOW", color=_low_color),
+]
+
+# m: id, product name, type, quantity, note, date
+MOVEMENT_COLUMNS = [
+    Column("ID", lambda m: str(m[0])),
+    Column("Product", lambda m: m[1]),
+    Column("Type", lambda m: m[2],
+           color=lambda m: Qt.darkGreen if m[2] == "IN" else Qt.red),
+    Column("Quantity", lambda m: str(m[3])),
+    Column("Note", lambda m: m[4] or ""),
+    Column("Date", lambda m: m[5][:16]),
+]
+
+
+STOCKOUT_TEXT = (f"📉  Projected to run out within {forecasting.STOCKOUT_HORIZON_DAYS} days "
+                 "or at their reorder point, at the forecast daily demand.")
+
+
+def _fetch_history(after, limit):
+    return db.get_stock_movements_page(None, after, limit)
 
 
 class StockMovementDialog(QDialog):
@@ -28,14 +68,8 @@ class StockMovementDialog(QDialog):
         layout.setSpacing(12)
         layout.setContentsMargins(24, 24, 24, 24)
 
-        self.product_combo = QComboBox()
-        products = db.get_all_products()
-        self.prod_map = {}
-        for p in products:
-            label = f"{p[1]} (SKU: {p[2]}) — Qty: {p[6]}"
-            self.product_combo.addItem(label, p[0])
-            self.prod_map[p[0]] = p
-        layout.addRow("Product", self.product_combo)
+        self.product_picker = ProductPicker()
+        layout.addRow("Product", self.product_picker)
 
         self.qty_input = QSpinBox()
         self.qty_input.setRange(1, 9999999)
@@ -56,13 +90,16 @@ class StockMovementDialog(QDialog):
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setObjectName("outlineBtn")
         cancel_btn.clicked.connect(self.reject)
+        # Enter in the picker selects a product; it must not submit the form.
+        save_btn.setAutoDefault(False)
+        cancel_btn.setAutoDefault(False)
         btn_layout.addStretch()
         btn_layout.addWidget(cancel_btn)
         btn_layout.addWidget(save_btn)
         layout.addRow(btn_layout)
 
     def save(self):
-        product_id = self.product_combo.currentData()
+        product_id = self.product_picker.product_id()
         qty = self.qty_input.value()
         note = self.note_input.toPlainText().strip()
 
@@ -70,21 +107,14 @@ class StockMovementDialog(QDialog):
             QMessageBox.warning(self, "Error", "Please select a product.")
             return
 
-        if self.movement_type == "OUT":
-            product = self.prod_map.get(product_id)
-            if product and qty > product[6]:
-                QMessageBox.warning(
-                    self, "Insufficient Stock",
-                    f"Only {product[6]} units available in stock."
-                )
-                return
-
         try:
             if self.movement_type == "IN":
                 db.add_stock_in(product_id, qty, note)
             else:
                 db.add_stock_out(product_id, qty, note)
             self.accept()
+        except db.InsufficientStockError as e:
+            QMessageBox.warning(self, "Insufficient Stock", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
@@ -92,8 +122,19 @@ class StockMovementDialog(QDialog):
 class StockPage(QWidget):
     """Stock tracking page."""
 
+    # Tables this page reads; it is reloaded only when one changes.
+    DATA_TABLES = ("categories", "products", "sales", "stock_movements")
+
+    # DataLoader key of every load of this page, opened or reloaded.
+    LOADER_KEY = "stock"
+
+    # Projected stockouts listed, soonest first. A catalog can have
+    # thousands; a table widget holding them all would be slow to fill.
+    STOCKOUT_ROWS = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.watcher = DataWatcher(self.DATA_TABLES)
         self.setup_ui()
 
     def setup_ui(self):
@@ -128,14 +169,12 @@ class StockPage(QWidget):
         stock_layout = QVBoxLayout(stock_widget)
         stock_layout.setContentsMargins(0, 12, 0, 0)
 
-        self.stock_table = QTableWidget()
-        self.stock_table.setColumnCount(7)
-        self.stock_table.setHorizontalHeaderLabels([
-            "ID", "Product", "SKU", "Category", "Qty", "Threshold", "Status"
-        ])
+        self.stock_model = PagedTableModel(STOCK_COLUMNS, parent=self)
+        self.stock_table = QTableView()
+        self.stock_table.setModel(self.stock_model)
         self.stock_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.stock_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.stock_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.stock_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.stock_table.setSelectionBehavior(QTableView.SelectRows)
         self.stock_table.setAlternatingRowColors(True)
         stock_layout.addWidget(self.stock_table)
         tabs.addTab(stock_widget, "📊  Current Stock")
@@ -145,14 +184,12 @@ class StockPage(QWidget):
         history_layout = QVBoxLayout(history_widget)
         history_layout.setContentsMargins(0, 12, 0, 0)
 
-        self.history_table = QTableWidget()
-        self.history_table.setColumnCount(6)
-        self.history_table.setHorizontalHeaderLabels([
-            "ID", "Product", "Type", "Quantity", "Note", "Date"
-        ])
+        self.history_model = PagedTableModel(MOVEMENT_COLUMNS, parent=self)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.history_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.history_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.history_table.setSelectionBehavior(QTableView.SelectRows)
         self.history_table.setAlternatingRowColors(True)
         history_layout.addWidget(self.history_table)
         tabs.addTab(history_widget, "📋  Movement History")
@@ -178,53 +215,55 @@ class StockPage(QWidget):
         self.alerts_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.alerts_table.setSelectionBehavior(QTableWidget.SelectRows)
         alerts_layout.addWidget(self.alerts_table)
+
+        stockout_banner = self.stockout_banner = QLabel(STOCKOUT_TEXT)
+        stockout_banner.setWordWrap(True)
+        stockout_banner.setStyleSheet("""
+            background-color: #fef7e0; color: #b06000; padding: 12px;
+            border-radius: 4px; font-weight: bold;
+        """)
+        alerts_layout.addWidget(stockout_banner)
+
+        self.stockout_table = QTableWidget()
+        self.stockout_table.setColumnCount(6)
+        self.stockout_table.setHorizontalHeaderLabels([
+            "Product", "SKU", "Current Qty", "Demand / Day", "Reorder Point", "Stockout Date"
+        ])
+        self.stockout_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.stockout_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stockout_table.setSelectionBehavior(QTableWidget.SelectRows)
+        alerts_layout.addWidget(self.stockout_table)
         tabs.addTab(alerts_widget, "🔔  Low Stock Alerts")
 
         layout.addWidget(tabs)
 
     def refresh(self):
-        self._load_stock()
-        self._load_history()
-        self._load_alerts()
-
-    def _load_stock(self):
-        self.stock_table.setRowCount(0)
-        products = db.get_all_products()
-        for p in products:
-            row = self.stock_table.rowCount()
-            self.stock_table.insertRow(row)
-            status = "✅ OK" if p[6] > p[7] else "⚠️ LOW"
-            items = [str(p[0]), p[1], p[2], p[3] or "N/A",
-                     str(p[6]), str(p[7]), status]
-            for col, val in enumerate(items):
-                item = QTableWidgetItem(val)
-                item.setTextAlignment(Qt.AlignCenter)
-                if col == 6 and p[6] <= p[7]:
-                    item.setForeground(Qt.red)
-                if col == 4 and p[6] <= p[7]:
-                    item.setForeground(Qt.red)
-                self.stock_table.setItem(row, col, item)
-
-    def _load_history(self):
-        self.history_table.setRowCount(0)
-        movements = db.get_stock_movements()
-        for m in movements:
-            row = self.history_table.rowCount()
-            self.history_table.insertRow(row)
-            items = [str(m[0]), m[1], m[2], str(m[3]), m[4] or "", m[5][:16]]
-            for col, val in enumerate(items):
-                item = QTableWidgetItem(val)
-                item.setTextAlignment(Qt.AlignCenter)
-                if col == 2:
-                    if m[2] == "IN":
-                        item.setForeground(Qt.darkGreen)
-                    else:
-                        item.setForeground(Qt.red)
-                self.history_table.setItem(row, col, item)
-
-    def _load_alerts(self):
+        """Reload every tab off the GUI thread."""
+        get_loader().submit(self.LOADER_KEY, self.load_data, self.show_data,
+                            self.show_load_error)
+
+    def is_stale(self):
+        return self.watcher.is_stale()
+
+    def load_data(self):
+        """Query the first page of each tab; safe off the GUI thread."""
+        return (self.watcher.versions(),
+                db.get_products_page(None, self.stock_model.page_size),
+                _fetch_history(None, self.history_model.page_size),
+                db.get_low_stock_products(),
+                # One extra row tells whether the list was cut short.
+                forecasting.get_projected_stockouts(limit=self.STOCKOUT_ROWS + 1))
+
+    def show_data(self, data):
+        versions, stock_page, history_page, low, stockouts = data
+        self.stock_model.set_fetch(db.get_products_page, stock_page)
+        self.history_model.set_fetch(_fetch_history, history_page)
+        self._show_alerts(low)
+        self._show_stockouts(stockouts)
+        self.watcher.mark(versions)
+
+    def _show_alerts(self, low):
         self.alerts_table.setRowCount(0)
-        low = db.get_low_stock_products()
         for p in low:
             row = self.alerts_table.rowCount()
             self.alerts_table.insertRow(row)
@@ -236,6 +275,26 @@ class StockPage(QWidget):
                     item.setForeground(Qt.red)
                 self.alerts_table.setItem(row, col, item)
 
+    def _show_stockouts(self, stockouts):
+        text = STOCKOUT_TEXT
+        if len(stockouts) > self.STOCKOUT_ROWS:
+            stockouts = stockouts[:self.STOCKOUT_ROWS]
+            text += f" The soonest {self.STOCKOUT_ROWS} are listed."
+        self.stockout_banner.setText(text)
+        self.stockout_table.setRowCount(len(stockouts))
+        for row, p in enumerate(stockouts):
+            # id, name, sku, category, qty, forecast, velocity, safety, reorder point, date
+            items = [p[1], p[2], str(p[4]), f"{p[5]:.1f}", f"{p[8]:.0f}", p[9] or "N/A"]
+            for col, val in enumerate(items):
+                item = QTableWidgetItem(val)
+                item.setTextAlignment(Qt.AlignCenter)
+                if col == 2 and p[4] <= p[8]:
+                    item.setForeground(Qt.red)
+                self.stockout_table.setItem(row, col, item)
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Error", message)
+
     def stock_in(self):
         dlg = StockMovementDialog(self, "IN")
         if dlg.exec_() == QDialog.Accepted:
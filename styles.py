@@ -64,7 +64,7 @@ QWidget {
 }
 
 /* ---- Tables ---- */
-QTableWidget {
+QTableView {
     background-color: #ffffff;
     border: 1px solid #dadce0;
     border-radius: 4px;
@@ -72,7 +72,7 @@ QTableWidget {
     selection-background-color: #e8f0fe;
     selection-color: #202124;
 }
-QTableWidget::item {
+QTableView::item {
     padding: 6px;
 }
 QHeaderView::section {
@@ -0,0 +1,104 @@
+"""
+table_models.py - Lazily paged table models for the list pages.
+
+Rows are pulled from the database one page at a time as the view scrolls
+(canFetchMore / fetchMore) and cells are only formatted when the view asks
+for them, so large tables never materialize all rows as widgets.
+"""
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QBrush
+
+
+class Column:
+    """One table column: a header and functions that render a raw row."""
+
+    def __init__(self, header, text, color=None, tooltip=None):
+        self.header = header
+        self.text = text          # row -> str
+        self.color = color        # row -> Qt color or None
+        self.tooltip = tooltip    # row -> str or None
+
+
+class PagedTableModel(QAbstractTableModel):
+    """Read-only table model fed by `fetch(after, limit)`.
+
+    `fetch` returns up to `limit` raw database rows following `after`, the
+    last row already loaded (None for the first page). A short page means
+    the result set is exhausted.
+    """
+
+    def __init__(self, columns, page_size=200, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.page_size = page_size
+        self._fetch = None
+        self._rows = []
+        self._exhausted = True
+
+    def set_fetch(self, fetch, first_page=None):
+        """Replace the data source and load its first page.
+
+        Pass `first_page` when it has already been fetched (e.g. on a
+        background thread) to avoid querying it again here.
+        """
+        self.beginResetModel()
+        self._fetch = fetch
+        self._rows = []
+        self._exhausted = fetch is None
+        self.endResetModel()
+        if first_page is None:
+            self.fetchMore(QModelIndex())
+        else:
+            self._add_page(first_page)
+
+    def row(self, index):
+        """Return the raw database row shown at `index`."""
+        return self._rows[index]
+
+    # ---- QAbstractTableModel interface ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section].header
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = self.columns[index.column()]
+        if role == Qt.DisplayRole:
+            return column.text(row)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.ForegroundRole and column.color:
+            color = column.color(row)
+            return QBrush(color) if color is not None else None
+        if role == Qt.ToolTipRole and column.tooltip:
+            return column.tooltip(row)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        after = self._rows[-1] if self._rows else None
+        self._add_page(self._fetch(after, self.page_size))
+
+    def _add_page(self, rows):
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
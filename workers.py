@@ -0,0 +1,138 @@
+"""
+workers.py - Background data loading for the pages.
+
+DataLoader runs database queries on a small thread pool and delivers the
+results back on the GUI thread. Requests are grouped by key: when a newer
+request is submitted under the same key, the result of the older one is
+dropped, so a slow query for a page the user has already left never
+overwrites what is on screen. Each page loads under one key, whether it
+is opened or reloads itself, so its newest request is the one shown.
+"""
+
+from PyQt5.QtCore import (
+    QCoreApplication, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+)
+from PyQt5.QtWidgets import QLabel
+
+
+class _Signals(QObject):
+    done = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+
+
+class _Task(QRunnable):
+    def __init__(self, ticket, func, signals):
+        super().__init__()
+        self.ticket = ticket
+        self.func = func
+        self.signals = signals
+
+    def run(self):
+        try:
+            result = self.func()
+        except Exception as e:
+            self.signals.error.emit(self.ticket, str(e))
+        else:
+            self.signals.done.emit(self.ticket, result)
+
+
+class DataLoader(QObject):
+    """Runs callables off the GUI thread and posts their results back."""
+
+    # Emitted with a key once nothing is pending under it any more.
+    finished = pyqtSignal(str)
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # Keep worker threads alive: each one holds a database connection.
+        self.pool.setExpiryTimeout(-1)
+        self.signals = _Signals()
+        self.signals.done.connect(self._on_done)
+        self.signals.error.connect(self._on_error)
+        self._next_ticket = 0
+        self._latest = {}       # key -> newest ticket
+        self._pending = {}      # ticket -> (key, on_done, on_error)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def submit(self, key, func, on_done, on_error=None):
+        """Run `func()` on the pool and call `on_done(result)` on the GUI thread.
+
+        Any earlier request still pending under `key` is superseded.
+        """
+        self._next_ticket += 1
+        ticket = self._next_ticket
+        self._latest[key] = ticket
+        self._pending[ticket] = (key, on_done, on_error)
+        self.pool.start(_Task(ticket, func, self.signals))
+        return ticket
+
+    def cancel(self, key):
+        """Drop the result of whatever is pending under `key`."""
+        self._latest.pop(key, None)
+
+    def is_pending(self, key):
+        return key in self._latest
+
+    def shutdown(self):
+        """Drop queued work and wait for running tasks before the app exits."""
+        self._latest.clear()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _take(self, ticket):
+        key, on_done, on_error = self._pending.pop(ticket)
+        if self._latest.get(key) != ticket:
+            return None
+        del self._latest[key]
+        return on_done, on_error
+
+    def _on_done(self, ticket, result):
+        key = self._pending[ticket][0]
+        callbacks = self._take(ticket)
+        if callbacks:
+            callbacks[0](result)
+        self._emit_finished(key)
+
+    def _on_error(self, ticket, message):
+        key = self._pending[ticket][0]
+        callbacks = self._take(ticket)
+        if callbacks and callbacks[1]:
+            callbacks[1](message)
+        self._emit_finished(key)
+
+    def _emit_finished(self, key):
+        if key not in self._latest:
+            self.finished.emit(key)
+
+
+_loader = None
+
+
+def get_loader():
+    """Return the application-wide DataLoader, creating it on first use."""
+    global _loader
+    if _loader is None:
+        _loader = DataLoader()
+    return _loader
+
+
+class LoadingOverlay(QLabel):
+    """Semi-transparent "Loading…" placeholder laid over another widget."""
+
+    def __init__(self, parent):
+        super().__init__("⏳  Loading…", parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setStyleSheet("""
+            background-color: rgba(248, 249, 250, 200);
+            color: #5f6368; font-size: 16px; font-weight: bold;
+        """)
+        self.hide()
+
+    def cover(self):
+        self.setGeometry(self.parentWidget().rect())
+        self.raise_()
+        self.show()